@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+YOLOv5-Lite CPU 运行配置自动调优
+用法：python autotune.py --weights driver/bestyolo.pt --labels driver/names.txt --img-sizes 640 512 416 --target-ms 80
+在本机用合成帧实测 线程数 × interop 线程数 × channels_last × 输入尺寸 的组合（含预处理与 NMS 的完整 detect 耗时），
+最快配置写入权重同目录的 autotune.json（按 主机名/权重文件名 区分，产线多台电脑可共用一个文件），
+之后 YOLOv5Lite(...) 在 CPU 上启动时自动应用
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import queue
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append('./')  # to run '$ python *.py' files in subdirectories
+
+
+def _bench(weights, labels, interop, threads, img_sizes, frame_hw, n, conf_thres, load_timeout, q):
+    # 子进程：interop 线程数每个进程只能设置一次，故每个 interop 取值单独起一个进程；异常放入队列交给父进程
+    try:
+        q.put(_bench_configs(weights, labels, interop, threads, img_sizes, frame_hw, n, conf_thres, load_timeout))
+    except Exception as e:
+        q.put(RuntimeError(f'interop {interop}: {type(e).__name__}: {e}'))
+
+
+def _bench_configs(weights, labels, interop, threads, img_sizes, frame_hw, n, conf_thres, load_timeout):
+    import torch
+    torch.set_num_interop_threads(interop)
+    from testyolo import YOLOv5Lite
+
+    det = YOLOv5Lite(weights, labels, confThreshold=conf_thres, device='cpu', render=False, profile=False)
+    t0 = time.time()
+    while not det.ready.value:  # 后台加载失败时 ready 不会置位
+        if time.time() - t0 > load_timeout:
+            raise TimeoutError(f'模型 {load_timeout:g}s 内未加载完成，请检查权重文件')
+        time.sleep(0.05)
+    frame = np.random.default_rng(0).integers(0, 256, (*frame_hw, 3), dtype=np.uint8)  # 合成帧
+
+    results = []
+    for imgsz in img_sizes:
+        for channels_last in (False, True):
+            det.model.to(memory_format=torch.channels_last if channels_last else torch.contiguous_format)
+            det.imgsz, det.channels_last, det._buf_shape = imgsz, channels_last, None
+            for t in threads:
+                torch.set_num_threads(t)
+                for _ in range(3):  # 预热
+                    det.detect(frame)
+                dt = []
+                for _ in range(n):
+                    t0 = time.perf_counter()
+                    det.detect(frame)
+                    dt.append(time.perf_counter() - t0)
+                cfg = {'threads': t, 'interop': interop, 'channels_last': channels_last, 'imgsz': imgsz,
+                       'ms': round(1000 * statistics.median(dt), 2)}
+                print(f"interop {interop:2d}  threads {t:2d}  channels_last {str(channels_last):5s}  "
+                      f"imgsz {imgsz:4d}  {cfg['ms']:8.2f} ms")
+                results.append(cfg)
+    return results
+
+
+def _collect(p, q, timeout):
+    # 等待子进程结果：子进程异常退出或超时不会让调优一直挂起
+    t0 = time.time()
+    while True:
+        try:
+            r = q.get(timeout=1.0)
+            break
+        except queue.Empty:
+            if not p.is_alive():
+                try:
+                    r = q.get(timeout=1.0)  # 结果可能在进程退出前刚放入
+                    break
+                except queue.Empty:
+                    raise RuntimeError(f'基准子进程异常退出 (exitcode {p.exitcode})') from None
+            if time.time() - t0 > timeout:
+                p.terminate()
+                raise TimeoutError(f'基准子进程 {timeout:g}s 内未完成')
+    p.join()
+    if isinstance(r, Exception):
+        raise r
+    return r
+
+
+def autotune(weights, labels, img_sizes=(640,), frame_hw=(480, 640), threads=None, interop=(1, 2), n=20,
+             target_ms=None, conf_thres=0.5, f=None, timeout=1800.0, load_timeout=120.0):
+    """
+    img_sizes: 候选输入尺寸；给定 target_ms 时选满足目标延迟的最大尺寸（都达不到则取最快的），
+               否则不论速度总是取最大尺寸（只调线程数与 channels_last）
+    threads  : 候选 intra-op 线程数，默认 1、2、4… 直到 CPU 核数
+    timeout  : 每个 interop 子进程的总时限（秒），load_timeout：模型加载时限；超时或子进程出错抛出异常
+    返回写入 profile 的配置 dict
+    """
+    cpus = os.cpu_count() or 1
+    threads = sorted(set(threads or [2 ** i for i in range(cpus.bit_length()) if 2 ** i <= cpus] + [cpus]))
+    img_sizes = sorted(set(img_sizes), reverse=True)
+
+    ctx = mp.get_context('spawn')
+    results = []
+    for k in interop:
+        q = ctx.Queue()
+        p = ctx.Process(target=_bench,
+                        args=(weights, labels, k, threads, img_sizes, frame_hw, n, conf_thres, load_timeout, q))
+        p.start()
+        results += _collect(p, q, timeout)
+
+    best = {s: min((r for r in results if r['imgsz'] == s), key=lambda r: r['ms']) for s in img_sizes}
+    ok = [s for s in img_sizes if target_ms is None or best[s]['ms'] <= target_ms]
+    cfg = best[ok[0]] if ok else min(best.values(), key=lambda r: r['ms'])
+
+    f = Path(f or Path(weights).parent / 'autotune.json')
+    profiles = json.loads(f.read_text(encoding='utf-8')) if f.exists() else {}
+    profiles[f'{platform.node()}/{Path(weights).name}'] = {**cfg, 'cpus': cpus, 'frame': list(frame_hw),
+                                                            'date': time.strftime('%Y-%m-%d %H:%M')}
+    f.write_text(json.dumps(profiles, indent=2, ensure_ascii=False), encoding='utf-8')
+    print(f"\n最快配置: {cfg['threads']} 线程, interop {cfg['interop']}, channels_last={cfg['channels_last']}, "
+          f"imgsz={cfg['imgsz']}，单帧 {cfg['ms']:.2f} ms，已写入 {f}")
+    return cfg
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='YOLOv5-Lite CPU 运行配置自动调优')
+    parser.add_argument('--weights', type=str, default='driver/bestyolo.pt', help='best.pt')
+    parser.add_argument('--labels', type=str, default='driver/names.txt', help='类别文件')
+    parser.add_argument('--img-sizes', nargs='+', type=int, default=[640],
+                        help='候选输入尺寸；不给 --target-ms 时不论速度总是选最大尺寸')
+    parser.add_argument('--frame', nargs=2, type=int, default=[480, 640], help='合成帧 h w（与相机分辨率一致）')
+    parser.add_argument('--threads', nargs='+', type=int, default=None, help='候选线程数')
+    parser.add_argument('--interop', nargs='+', type=int, default=[1, 2], help='候选 interop 线程数')
+    parser.add_argument('--n', type=int, default=20, help='每个组合计时次数')
+    parser.add_argument('--target-ms', type=float, default=None, help='目标单帧延迟')
+    parser.add_argument('--conf-threshold', type=float, default=0.5)
+    parser.add_argument('--profile', type=str, default=None, help='输出文件，默认权重同目录 autotune.json')
+    parser.add_argument('--timeout', type=float, default=1800, help='每个 interop 子进程的时限（秒）')
+    opt = parser.parse_args()
+    autotune(opt.weights, opt.labels, opt.img_sizes, opt.frame, opt.threads, opt.interop, opt.n, opt.target_ms,
+             opt.conf_threshold, opt.profile, opt.timeout)
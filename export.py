@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+YOLOv5-Lite 导出 ONNX
+用法：python export.py --weights driver/bestyolo.pt --img-size 480 640
+导出图的输出与 eager 推理的 pred 完全一致：(bs, N, 5+nc)，已解码为像素坐标，NMS 仍在外部做
+"""
+import argparse
+import inspect
+import sys
+import time
+from pathlib import Path
+
+import torch
+
+# ---------- PyTorch 2.x 兼容性补丁 ----------
+if torch.__version__.startswith('2.'):
+    _torch_load = torch.load
+    torch.load = lambda *a, **k: _torch_load(*a, **{**k, 'weights_only': False})
+
+sys.path.append('./')  # to run '$ python *.py' files in subdirectories
+from models.experimental import attempt_load
+from models.yolo import Detect
+from utils.general import check_img_size
+
+
+def export_onnx(weights, img_size=(640, 640), opset=13, dynamic=True, f=None):
+    """
+    weights : 训练得到的 .pt
+    img_size: (h, w)，需为步长整数倍；网格在导出时固化，推理时按此尺寸 letterbox
+    dynamic : batch 维是否动态（detect_batch 多路相机需要）
+    返回导出的 .onnx 路径
+    """
+    t0 = time.time()
+    model = attempt_load(weights, map_location=torch.device('cpu'))  # 已 fuse
+    model.eval()
+    stride = int(model.stride.max())
+    img_size = [check_img_size(x, stride) for x in img_size]
+
+    # Detect 头改用 mnnd_forward：无原地切片赋值，只输出解码后的预测张量
+    for m in model.modules():
+        if isinstance(m, Detect):
+            m.forward = m.mnnd_forward
+
+    img = torch.zeros(1, 3, *img_size)
+    model(img)  # dry run，建立网格
+    f = str(f or Path(weights).with_suffix('.onnx'))
+    # 新版 torch 默认走 dynamo 导出，fuse 后的模型需用 TorchScript 导出器
+    kwargs = {'dynamo': False} if 'dynamo' in inspect.signature(torch.onnx.export).parameters else {}
+    torch.onnx.export(model, img, f, verbose=False, opset_version=opset,
+                      input_names=['images'], output_names=['output'],
+                      dynamic_axes={'images': {0: 'batch'}, 'output': {0: 'batch'}} if dynamic else None,
+                      **kwargs)
+
+    # 写入推理所需的元数据，运行端无需再读 .pt
+    import onnx
+    model_onnx = onnx.load(f)
+    onnx.checker.check_model(model_onnx)
+    for k, v in {'stride': stride, 'names': list(model.names)}.items():
+        meta = model_onnx.metadata_props.add()
+        meta.key, meta.value = k, str(v)
+    onnx.save(model_onnx, f)
+    print(f'ONNX 导出完成: {f} ({img_size[0]}x{img_size[1]})，耗时 {time.time() - t0:.2f}s')
+    return f
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='YOLOv5-Lite 导出 ONNX')
+    parser.add_argument('--weights', type=str, default='driver/bestyolo.pt', help='best.pt')
+    parser.add_argument('--img-size', nargs='+', type=int, default=[640, 640], help='h w')
+    parser.add_argument('--opset', type=int, default=13, help='ONNX opset')
+    parser.add_argument('--static-batch', action='store_true', help='固定 batch=1')
+    opt = parser.parse_args()
+    opt.img_size *= 2 if len(opt.img_size) == 1 else 1  # expand
+    export_onnx(opt.weights, opt.img_size, opt.opset, dynamic=not opt.static_batch)
@@ -591,7 +591,7 @@ class SELayer(nn.Module):
 # -------------------------------------------------------------------------
 
 def channel_shuffle(x, groups):
-    batchsize, num_channels, height, width = x.data.size()
+    batchsize, num_channels, height, width = x.size()  # not x.data: keeps batch dynamic in ONNX export
     channels_per_group = num_channels // groups
 
     # reshape
@@ -1,5 +1,8 @@
 # YOLOv5 experimental modules
 
+import hashlib
+from pathlib import Path
+
 import numpy as np
 import torch
 import torch.nn as nn
@@ -99,24 +102,102 @@ class Ensemble(nn.ModuleList):
     # Ensemble of models
     def __init__(self):
         super(Ensemble, self).__init__()
+        self.pool = None  # per-member single-thread executors, see parallel()
+        self.threads = None  # intra-op threads per member while it runs, see parallel()
+        self.wbf = None  # weighted boxes fusion settings, see parallel()
+
+    def parallel(self, threads=None, wbf=True, weights=None, conf_thres=0.25, iou_thres=0.45, wbf_iou=0.55,
+                 wbf_rescale=False):
+        # Run members concurrently, each on its own worker thread with its share of the intra-op threads
+        #   threads: intra-op threads per member, default torch.get_num_threads() split evenly. The intra-op thread
+        #            count is process-wide in torch, so it is only lowered for the duration of each forward() and
+        #            restored afterwards; other threads running inference at the same time see the lowered count
+        #   wbf: fuse members with weighted_boxes_fusion (member NMS at conf_thres/iou_thres) instead of concatenation
+        #   wbf_rescale: scale fused confidences down by the fraction of members that agree. Off by default, the
+        #                caller's NMS applies conf_thres again and would drop every box only one member finds
+        from concurrent.futures import ThreadPoolExecutor
+        self.threads = threads or [max(torch.get_num_threads() // len(self), 1)] * len(self)
+        self.pool = [ThreadPoolExecutor(1) for _ in self]
+        self.wbf = dict(weights=weights, conf_thres=conf_thres, iou_thres=iou_thres, wbf_iou=wbf_iou,
+                        rescale=wbf_rescale) if wbf else None
+        return self
 
     def forward(self, x, augment=False):
-        y = []
-        for module in self:
-            y.append(module(x, augment)[0])
+        if self.pool:
+            grad = torch.is_grad_enabled()  # grad mode is thread-local
+            n = torch.get_num_threads()
+
+            def run(module, t):
+                torch.set_num_threads(t)
+                try:
+                    with torch.set_grad_enabled(grad):
+                        return module(x, augment)[0]
+                finally:
+                    torch.set_num_threads(n)
+
+            try:
+                y = [f.result() for f in [pool.submit(run, m, t) for pool, m, t in zip(self.pool, self, self.threads)]]
+            finally:
+                torch.set_num_threads(n)  # a member finishing first must not leave the others' count behind
+        else:
+            y = [module(x, augment)[0] for module in self]
+        if self.wbf:
+            return self.fuse_boxes(y), None
         # y = torch.stack(y).max(0)[0]  # max ensemble
         # y = torch.stack(y).mean(0)  # mean ensemble
         y = torch.cat(y, 1)  # nms ensemble
         return y, None  # inference, train output
 
-
-def attempt_load(weights, map_location=None):
+    def fuse_boxes(self, y):
+        # Member predictions -> weighted boxes fusion -> (bs, n, no) predictions (xywh, obj=fused conf, one-hot cls),
+        # zero-padded, so the usual non_max_suppression() afterwards keeps working
+        from utils.general import non_max_suppression, weighted_boxes_fusion, xyxy2xywh
+        h = self.wbf
+        dets = [non_max_suppression(p, h['conf_thres'], h['iou_thres']) for p in y]  # [member][image]
+        fused = [weighted_boxes_fusion(d, h['weights'], h['wbf_iou'], rescale=h['rescale']) for d in zip(*dets)]
+        out = y[0].new_zeros((len(fused), max(len(d) for d in fused), y[0].shape[2]))
+        for i, d in enumerate(fused):
+            out[i, :len(d), :4] = xyxy2xywh(d[:, :4])
+            out[i, :len(d), 4] = d[:, 4]
+            out[i, range(len(d)), 5 + d[:, 5].long()] = 1.0
+        return out
+
+
+def load_fused(w, map_location=None):
+    # Loads a fused FP32 inference model, reusing a pre-fused copy cached next to the checkpoint (keyed by its hash)
+    h = hashlib.sha1(Path(w).read_bytes()).hexdigest()[:16]
+    f = Path(w).parent / '.fused' / f'{Path(w).stem}-{h}.pt'
+    if f.is_file():
+        try:
+            c = torch.load(f, map_location=map_location)
+            if c.get('torch') == torch.__version__:  # pickled modules are tied to the torch version
+                return c['model']
+        except Exception as e:
+            print(f'WARNING: fused cache {f} unusable ({e}), rebuilding')
+
+    ckpt = torch.load(w, map_location=map_location)  # load
+    model = ckpt['ema' if ckpt.get('ema') else 'model'].float().fuse().eval()  # FP32 model
+    try:
+        f.parent.mkdir(exist_ok=True)
+        for old in f.parent.glob(f'{Path(w).stem}-' + '[0-9a-f]' * 16 + '.pt'):  # stale entries of a retrained ckpt
+            old.unlink()
+        torch.save({'model': model, 'torch': torch.__version__}, f)
+    except OSError as e:
+        print(f'WARNING: fused cache {f} not saved ({e})')
+    return model
+
+
+def attempt_load(weights, map_location=None, cache=False):
     # Loads an ensemble of models weights=[a,b,c] or a single model weights=[a] or weights=a
+    # cache=True skips unpickling the training checkpoint and re-fusing on later launches, see load_fused()
     model = Ensemble()
     for w in weights if isinstance(weights, list) else [weights]:
         attempt_download(w)
-        ckpt = torch.load(w, map_location=map_location)  # load
-        model.append(ckpt['ema' if ckpt.get('ema') else 'model'].float().fuse().eval())  # FP32 model
+        if cache:
+            model.append(load_fused(w, map_location))
+        else:
+            ckpt = torch.load(w, map_location=map_location)  # load
+            model.append(ckpt['ema' if ckpt.get('ema') else 'model'].float().fuse().eval())  # FP32 model
 
     # Compatibility updates
     for m in model.modules():
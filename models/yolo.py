@@ -24,6 +24,7 @@ except ImportError:
 class Detect(nn.Module):
     stride = None  # strides computed during build
     export = False  # onnx export
+    conf_thres = None  # inference objectness threshold, decode only anchors above it (see sparse_forward)
 
     def __init__(self, nc=80, anchors=(), ch=()):  # detection layer
         super(Detect, self).__init__()
@@ -41,6 +42,8 @@ class Detect(nn.Module):
         # x = x.copy()  # for profiling
         z = []  # inference output
         self.training |= self.export
+        if self.conf_thres is not None and not self.training:
+            return self.sparse_forward(x)
         for i in range(self.nl):
             x[i] = self.m[i](x[i])  # conv
             bs, _, ny, nx = x[i].shape  # x(bs,255,20,20) to x(bs,3,20,20,85)
@@ -48,7 +51,7 @@ class Detect(nn.Module):
 
             if not self.training:  # inference
                 if self.grid[i].shape[2:4] != x[i].shape[2:4]:
-                    self.grid[i] = self._make_grid(nx, ny).to(x[i].device)
+                    self.grid[i] = self._cached_grid(nx, ny, x[i].device)
 
                 y = x[i].sigmoid()
                 y[..., 0:2] = (y[..., 0:2] * 2. - 0.5 + self.grid[i]) * self.stride[i]  # xy
@@ -57,6 +60,29 @@ class Detect(nn.Module):
 
         return x if self.training else (torch.cat(z, 1), x)
 
+    def sparse_forward(self, x):
+        # Fused decode-and-threshold inference: per scale only anchors with objectness > conf_thres are decoded.
+        # Returns (bs, k, no) zero-padded to the largest candidate count in the batch, rows in the same anchor order
+        # as forward(), so non_max_suppression() at conf_thres >= self.conf_thres gives identical detections
+        bi, z = [], []
+        for i in range(self.nl):
+            x[i] = self.m[i](x[i])  # conv
+            bs, _, ny, nx = x[i].shape
+            p = x[i].view(bs, self.na, self.no, ny, nx)
+            b, a, gy, gx = (p[:, :, 4].sigmoid() > self.conf_thres).nonzero(as_tuple=True)  # candidates
+            y = p[b, a, :, gy, gx].sigmoid()  # (k, no)
+            y[:, 0:2] = (y[:, 0:2] * 2. - 0.5 + torch.stack((gx, gy), 1).float()) * self.stride[i]  # xy
+            y[:, 2:4] = (y[:, 2:4] * 2) ** 2 * self.anchor_grid[i].view(self.na, 2)[a]  # wh
+            bi.append(b)
+            z.append(y)
+
+        bi, z = torch.cat(bi), torch.cat(z)
+        bi, k = bi.sort(stable=True)  # group by image, keep scale/anchor order within each image
+        n = torch.bincount(bi, minlength=bs)
+        out = torch.zeros((bs, int(n.max()) if len(bi) else 0, self.no), device=z.device, dtype=z.dtype)
+        out[bi, torch.arange(len(bi), device=bi.device) - (n.cumsum(0) - n)[bi]] = z[k]
+        return out, x
+
     def cat_forward(self, x):
         z = []  # inference output
         for i in range(self.nl):
@@ -163,6 +189,13 @@ class Detect(nn.Module):
             output[index] = pre[i]
         return output
 
+    def _cached_grid(self, nx, ny, device):
+        # Grids are kept per input resolution, so cameras with different frame shapes do not rebuild them
+        cache = self.__dict__.setdefault('grid_cache', {})
+        if (nx, ny, device) not in cache:
+            cache[(nx, ny, device)] = self._make_grid(nx, ny).to(device)
+        return cache[(nx, ny, device)]
+
     @staticmethod
     def _make_grid(nx=20, ny=20):
         yv, xv = torch.meshgrid([torch.arange(ny), torch.arange(nx)])
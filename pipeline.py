@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+检测-分割级联（README 中 RobotVisionInterface.process_crayfish 的流程）
+同一帧先用 YOLOv5Lite 整帧检测，再只把检测到的小龙虾裁剪块以小输入尺寸批量送入 YOLOv11Seg 分割，
+轮廓与头尾切割线映射回整帧；分割计算量随小龙虾数量和大小变化，而非整帧
+用法：python pipeline.py --source images/test.jpg
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+
+class RobotVisionInterface:
+    """
+    detector : testyolo.YOLOv5Lite（默认 driver/bestyolo.pt）
+    segmenter: testseg.YOLOv11Seg（默认 driver/bestseg.pt，开启切割线计算）
+    seg_imgsz: 裁剪块的分割输入尺寸；margin：裁剪框四周外扩比例
+    max_det  : 每帧最多送入分割的检测数（按置信度取前 max_det 个），min_conf：送入分割的最低置信度，
+               None 沿用检测器阈值；传送带拥挤时分割耗时不随检测数无限增长
+    """
+    def __init__(self, detector=None, segmenter=None, seg_imgsz=256, margin=0.15, max_det=20, min_conf=None):
+        if detector is None:
+            from testyolo import YOLOv5Lite
+            detector = YOLOv5Lite('driver/bestyolo.pt', 'driver/names1.txt', confThreshold=0.45, nmsThreshold=0.5,
+                                  render=False)
+        if segmenter is None:
+            from testseg import YOLOv11Seg
+            segmenter = YOLOv11Seg('driver/bestseg.pt', 'driver/names2.txt', confThreshold=0.45, nmsThreshold=0.5,
+                                   render=False, imgsz=seg_imgsz, cut=True)
+        self.detection_system = detector
+        self.segmentation_system = segmenter
+        self.seg_imgsz = seg_imgsz
+        self.margin = margin
+        self.max_det = max_det
+        self.min_conf = min_conf
+
+    def process_crayfish(self, image):
+        """
+        image: 一次采集的 BGR 帧，检测与分割共用
+        返回 dict（整帧像素，第 i 项对应第 i 只小龙虾；只含通过 min_conf / max_det 筛选、送入分割的检测，置信度降序）：
+            boxes / classIds / confidences : 检测结果
+            body_center  : (n,2) 检测框中心
+            head_contour : n 个 (k,2) 轮廓
+            tail_position: (n,2) 尾端点；cutting_path：(n,2,2) 头尾切割线端点（未分割出时为 nan）
+            seg          : testseg.SegResult；cost：检测 + 分割耗时（秒）
+        """
+        _, classIds, confidences, boxes, t_det = self.detection_system.detect(image, render=False)
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        classIds, confidences = np.asarray(classIds), np.asarray(confidences, dtype=np.float32)
+        i = np.argsort(-confidences, kind='stable')
+        if self.min_conf is not None:
+            i = i[confidences[i] >= self.min_conf]
+        i = i[:self.max_det]
+        boxes, classIds, confidences = boxes[i], classIds[i], confidences[i]
+        _, seg = self.segmentation_system.segment_crops(image, boxes, self.seg_imgsz, self.margin, render=False)
+        cuts = seg.cuts or {}
+        nan = np.full((len(boxes), 2), np.nan)
+        return {
+            'boxes': boxes,
+            'classIds': classIds,
+            'confidences': confidences,
+            'body_center': (boxes[:, :2] + boxes[:, 2:]) / 2,
+            'tail_position': cuts.get('tail', nan),
+            'head_contour': seg.contours,
+            'cutting_path': cuts.get('cut', np.full((len(boxes), 2, 2), np.nan)),
+            'seg': seg,
+            'cost': t_det + seg.cost,
+        }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='小龙虾检测-分割级联')
+    parser.add_argument('--source', type=str, required=True, help='图片路径')
+    parser.add_argument('--seg-imgsz', type=int, default=256, help='裁剪块分割输入尺寸')
+    parser.add_argument('--max-det', type=int, default=20, help='每帧最多送入分割的检测数')
+    parser.add_argument('--min-conf', type=float, default=None, help='送入分割的最低置信度')
+    opt = parser.parse_args()
+
+    robot = RobotVisionInterface(seg_imgsz=opt.seg_imgsz, max_det=opt.max_det, min_conf=opt.min_conf)
+    while not robot.detection_system.ready.value:  # 检测模型后台加载
+        time.sleep(0.05)
+    img = cv2.imread(opt.source)
+    out = robot.process_crayfish(img)
+    print(f"{len(out['boxes'])} 只小龙虾，耗时 {out['cost'] * 1000:.1f} ms")
+    for c, cut in zip(out['body_center'], out['cutting_path']):
+        print(f'  中心 ({c[0]:.0f}, {c[1]:.0f})  切割线 {np.round(cut).tolist()}')
+    cv2.imwrite('pipeline_out.jpg', robot.segmentation_system.draw(img, out['seg']))
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+YOLOv5-Lite INT8 训练后量化（ONNX Runtime 静态量化，QDQ 格式）
+用法：python quantize.py --weights driver/bestyolo.pt --calib driver/calib --val driver/val --img-size 480 640
+输出 driver/bestyolo.int8.onnx，YOLOv5Lite(..., backend='int8') 直接加载
+"""
+import argparse
+import re
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import torch
+from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType,
+                                      quantize_static)
+
+from export import export_onnx
+from testyolo import OrtModel
+from utils.datasets import LoadImages, letterbox
+from utils.general import box_iou, non_max_suppression
+
+
+def _to_input(img0, input_hw, stride):
+    # letterbox 到固定输入尺寸，BGR->RGB, HWC->CHW, 0~1
+    img = letterbox(img0, input_hw, auto=False, stride=stride)[0]
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB).transpose(2, 0, 1)
+    return np.ascontiguousarray(img[None], dtype=np.float32) / 255.0
+
+
+class LoadImagesReader(CalibrationDataReader):
+    # 标定数据：通过 utils.datasets.LoadImages 读取小龙虾标定集
+    def __init__(self, path, input_name, input_hw, stride=32, n=100):
+        self.dataset = iter(LoadImages(path, img_size=max(input_hw), stride=stride))
+        self.input_name, self.input_hw, self.stride = input_name, input_hw, stride
+        self.n = n
+
+    def get_next(self):
+        if self.n <= 0:
+            return None
+        self.n -= 1
+        _, _, img0, _ = next(self.dataset, (None,) * 4)
+        return None if img0 is None else {self.input_name: _to_input(img0, self.input_hw, self.stride)}
+
+
+def quantize_int8(weights, calib, img_size=(640, 640), calib_num=100, f=None):
+    """
+    weights: .pt（先按 img_size 导出 FP32 ONNX 到 <weights>.int8.fp32.onnx，不覆盖 backend='onnx' 使用的同名 .onnx）
+             或已导出的 .onnx
+    calib  : 标定图片目录，几十到一百张产线图即可
+    返回 (INT8 .onnx 路径, 量化所用的 FP32 .onnx 路径)
+    """
+    t0 = time.time()
+    f = str(f or Path(weights).with_suffix('.int8.onnx'))
+    fp32 = weights if Path(weights).suffix == '.onnx' else \
+        export_onnx(weights, img_size, f=Path(f).with_suffix('.fp32.onnx'))
+    ref = OrtModel(fp32, torch.device('cpu'))
+
+    # Conv / Shuffle_Block / RepVGGBlock（fuse 后均为 Conv+激活）全部量化；
+    # Detect 头只量化输出卷积，解码部分（sigmoid、网格、anchor）保留 FP32，避免像素坐标量化误差
+    import onnx
+    model_onnx = onnx.load(fp32)
+    if model_onnx.opset_import[0].version < 13:  # 逐通道 QDQ 需要 opset>=13
+        from onnx import version_converter
+        model_onnx = version_converter.convert_version(model_onnx, 13)
+        fp32 = str(Path(f).with_suffix('.fp32.onnx'))
+        onnx.save(model_onnx, fp32)
+    idx = max(int(m.group(1)) for n in model_onnx.graph.node if (m := re.match(r'/model\.(\d+)/', n.name)))
+    exclude = [n.name for n in model_onnx.graph.node
+               if n.name.startswith(f'/model.{idx}/') and n.op_type != 'Conv']
+
+    # 量化前预处理：ONNX 形状推断 + 图优化，便于 Conv/Relu/Add 等节点正确融合为 QDQ 组
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+    pre = str(Path(f).with_suffix('.pre.onnx'))
+    quant_pre_process(fp32, pre, skip_symbolic_shape=True)
+
+    reader = LoadImagesReader(calib, ref.input_name, ref.input_hw, int(ref.stride.max()), calib_num)
+    quantize_static(pre, f, reader,
+                    quant_format=QuantFormat.QDQ,
+                    per_channel=True,
+                    activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8,
+                    calibrate_method=CalibrationMethod.MinMax,
+                    nodes_to_exclude=exclude)
+
+    # 带上 FP32 模型的元数据（stride、names）
+    model_int8 = onnx.load(f)
+    del model_int8.metadata_props[:]
+    model_int8.metadata_props.extend(model_onnx.metadata_props)
+    onnx.save(model_int8, f)
+    Path(pre).unlink()
+    print(f'\nINT8 量化完成: {f}，耗时 {time.time() - t0:.2f}s')
+    return f, fp32
+
+
+def compare(fp32, int8, val, conf_thres=0.45, iou_thres=0.5, warmup=3):
+    """
+    在验证集目录上对比 FP32 与 INT8：以 FP32 检测结果为参考，统计 INT8 的召回、精确率、匹配框平均 IoU 以及平均前向延迟
+    """
+    models = {'FP32': OrtModel(fp32, torch.device('cpu')), 'INT8': OrtModel(int8, torch.device('cpu'))}
+    stride = int(models['FP32'].stride.max())
+    dt = {k: [] for k in models}
+    n_ref = n_q = tp = 0
+    ious = []
+    for _, _, img0, _ in LoadImages(val, img_size=max(models['FP32'].input_hw), stride=stride):
+        x = torch.from_numpy(_to_input(img0, models['FP32'].input_hw, stride))
+        det = {}
+        for k, m in models.items():
+            for _ in range(warmup):  # 首张图预热
+                m(x)
+            t = time.time()
+            pred = m(x)[0]
+            dt[k].append(time.time() - t)  # 只计前向，NMS 两者相同
+            det[k] = non_max_suppression(pred, conf_thres, iou_thres, agnostic=True)[0]
+        warmup = 0
+
+        a, b = det['FP32'], det['INT8']
+        n_ref, n_q = n_ref + len(a), n_q + len(b)
+        if len(a) and len(b):
+            iou = box_iou(a[:, :4], b[:, :4])
+            iou[a[:, 5:6] != b[:, 5]] = 0  # 类别需一致
+            best = iou.max(1)[0]
+            tp += int((best > 0.5).sum())
+            ious += best[best > 0.5].tolist()
+    print('')
+
+    ms = {k: 1000 * float(np.mean(v)) for k, v in dt.items()}
+    size = {'FP32': Path(fp32).stat().st_size / 1E6, 'INT8': Path(int8).stat().st_size / 1E6}
+    print(f"{'':10s}{'延迟(ms)':>12s}{'大小(MB)':>12s}{'检测数':>10s}")
+    for k in models:
+        print(f'{k:10s}{ms[k]:12.1f}{size[k]:12.2f}{n_ref if k == "FP32" else n_q:10d}')
+    print(f"加速 {ms['FP32'] / ms['INT8']:.2f}x | 相对 FP32：召回 {tp / max(n_ref, 1):.3f}  "
+          f"精确率 {tp / max(n_q, 1):.3f}  平均IoU {np.mean(ious) if ious else 0:.3f}")
+    return ms, tp / max(n_ref, 1), tp / max(n_q, 1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='YOLOv5-Lite INT8 训练后量化')
+    parser.add_argument('--weights', type=str, default='driver/bestyolo.pt', help='best.pt 或 FP32 .onnx')
+    parser.add_argument('--calib', type=str, default='driver/calib', help='标定图片目录')
+    parser.add_argument('--calib-num', type=int, default=100, help='最多使用的标定图片数')
+    parser.add_argument('--val', type=str, default='', help='验证图片目录（为空则不对比）')
+    parser.add_argument('--img-size', nargs='+', type=int, default=[640, 640], help='h w')
+    parser.add_argument('--conf-threshold', type=float, default=0.45)
+    parser.add_argument('--nms-threshold', type=float, default=0.5)
+    opt = parser.parse_args()
+    opt.img_size *= 2 if len(opt.img_size) == 1 else 1  # expand
+
+    f, fp32 = quantize_int8(opt.weights, opt.calib, opt.img_size, opt.calib_num)
+    if opt.val:
+        compare(fp32, f, opt.val, opt.conf_threshold, opt.nms_threshold)  # 与量化所用的同一 FP32 模型对比
@@ -7,6 +7,7 @@ from sub1 import Form1
 from sub2 import Form2
 from sub3 import From3
 from sub4 import Form4
+from utils.camera import open_camera
 from PyQt5 import QtGui
 from PyQt5.QtCore import Qt, QRect, QTimer, QDateTime   # ← 新增 QTimer/QDateTime
  
@@ -29,6 +30,8 @@ class Form(QWidget, Ui_Form):
         self.pushButton_4.clicked.connect(self.kimi)
         self.pushButton_5.clicked.connect(self.yolo)
         self.pushButton_6.clicked.connect(self.seg)        
+        # 主界面持有一个摄像头订阅：设备只在后台打开一次，检测/分割页面切换时无需重新打开
+        self.camera = open_camera(0, profile='low-latency')  # MJPG 640x480@30，1 帧缓冲；各窗口用同一后端与配置
         self._resize_dir = None
         self._resize_flag = False
 
@@ -1,6 +1,5 @@
 # From3.py
 import cv2
-import numpy as np
 from PyQt5.QtWidgets import QWidget
 from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
 from PyQt5.QtGui import QImage, QPixmap
@@ -11,6 +10,9 @@ from PyQt5.QtCore import Qt, QRectF
 from PyQt5 import QtGui
 from PyQt5.QtCore import Qt, QRect
 from PyQt5 import QtCore
+from utils.camera import capture_info, open_camera
+from utils.framebus import InferencePool
+from utils.overlay import OverlayRenderer
 
 def set_rounded_mask(label, radius=20):
     """根据 QLabel 当前 geometry 动态生成圆角蒙版"""
@@ -23,7 +25,7 @@ def set_rounded_mask(label, radius=20):
 # 模型加载线程
 class ModelLoadThread(QThread):
     progress_update = pyqtSignal(str)  # 进度信息
-    load_finished = pyqtSignal(object)  # 加载完成，传递detector对象
+    load_finished = pyqtSignal(object)  # 加载完成，传递推理进程池 utils.framebus.InferencePool
     load_error = pyqtSignal(str)  # 加载错误
     
     def __init__(self, model_path, label_path, conf_threshold=0.3, nms_threshold=0.5):
@@ -46,6 +48,7 @@ class ModelLoadThread(QThread):
             
             self.progress_update.emit("正在导入YOLO模块...")
             # 导入放在这里避免主线程阻塞
+            from functools import partial
             from testyolo import YOLOv5Lite
             
             self.progress_update.emit("✓ 依赖库导入完成")
@@ -57,13 +60,22 @@ class ModelLoadThread(QThread):
             self.progress_update.emit("正在加载模型文件...")
             self.progress_update.emit("Fusing layers...")
             
-            # 创建检测器（这里会显示所有加载信息）
-            detector = YOLOv5Lite(
+            # 检测器在独立的推理进程中创建，帧经共享内存传递，界面进程不与模型争抢 GIL 和 CPU
+            detector = InferencePool(partial(
+                YOLOv5Lite,
                 self.model_path,
                 self.label_path,
                 confThreshold=self.conf_threshold,
-                nmsThreshold=self.nms_threshold
-            )
+                nmsThreshold=self.nms_threshold,
+                render=False,       # 绘制在界面进程完成
+                motion_gate=None    # 静止帧跳过默认关闭，开启见 utils.motion.MotionGate
+            ))
+            try:
+                detector.wait_ready()   # 模型加载失败或超时时抛出 RuntimeError
+            except RuntimeError:
+                detector.close()
+                raise
+            self.renderer = OverlayRenderer(detector.names, line_thickness=2)  # 类别名由推理进程读取标签文件后传回
             
             self.progress_update.emit("✓ 模型加载完成!")
             self.progress_update.emit("正在预热模型...")
@@ -237,10 +249,23 @@ class From3(QWidget, Ui_Form3):
 
     # 实时刷新 video QLabel
     def update_video(self):
-        if self.cap is not None:
-            ret, frame = self.cap.read()
-            if ret:
-                self.show_frame_on_label(frame, self.video)
+        if self.model_loaded:
+            self.poll_results()
+        if self.cap is None:
+            return
+        if self.cap.error:
+            self.timer.stop()
+            self.update_loading_progress(f"❌ 摄像头初始化失败: {self.cap.error}")
+            self.text.append("⚠️  将在无摄像头模式下运行")
+            self.cap.close()  # 释放共享摄像头的引用
+            self.cap = None
+            return
+        frame = self.cap.latest()  # 取采集线程的最新帧，不阻塞界面
+        if frame is not None and (self._shown is None or frame.seq != self._shown.seq):
+            if self._shown is None and self.cap.settings:
+                self.update_loading_progress(f"📷 {capture_info(self.cap.settings)}")  # 实际生效的采集参数
+            self._shown = frame
+            self.show_frame_on_label(frame.image, self.video)
 
     # 把 cv::Mat 放到 QLabel，保持高流畅度
     def show_frame_on_label(self, frame, label):
@@ -251,24 +276,22 @@ class From3(QWidget, Ui_Form3):
         label.setPixmap(QPixmap.fromImage(qimg).scaled(
             label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation))
 
-    # 推理线程，防止界面卡顿
-    class _DetectThread(QThread):
-        finished = pyqtSignal(np.ndarray, list, list, list, float)
-
-        def __init__(self, detector, frame):
-            super().__init__()
-            self.detector = detector
-            self.frame = frame
-
-        def run(self):
-            img, classIds, confidences, boxes, cost = self.detector.detect(self.frame.copy())
-            self.finished.emit(
-    img,
-    classIds.tolist() if isinstance(classIds, np.ndarray) else classIds,
-    confidences.tolist() if isinstance(confidences, np.ndarray) else confidences,
-    [list(map(int, box)) for box in boxes],
-    cost
-)
+    # 取推理进程返回的结果（由刷新定时器调用，不阻塞界面），在提交时的那一帧上绘制
+    def poll_results(self):
+        for r in self.detector.poll():
+            frame = self._inflight.pop(r.seq, None)
+            if r.error:
+                self.update_loading_progress(f"❌ 推理失败: {r.error}")
+                continue
+            if frame is None:
+                continue
+            if r.stale:
+                self.update_loading_progress("⚠️ 画面已被新帧覆盖，请重新检测")
+                continue
+            classIds, confidences, boxes, cost = r.result
+            img = self.renderer.draw(frame.image.copy(), boxes, confidences, classIds)
+            self.on_detect_finished(img, classIds.tolist(), confidences.tolist(), boxes.tolist(), cost,
+                                    r.skip_ratio)
 
     # start 按钮
     def on_start(self):
@@ -280,26 +303,28 @@ class From3(QWidget, Ui_Form3):
             self.update_loading_progress("❌ 摄像头未初始化，无法进行检测")
             return
             
-        ret, frame = self.cap.read()
-        if not ret:
+        # 检测当前显示的那一帧，无需再次读取摄像头
+        frame = self._shown
+        if frame is None:
             self.update_loading_progress("❌ 无法获取摄像头画面")
             return
 
         # 提示用户
         self.text.setPlainText("🔍 正在进行目标检测...\n请稍候...")
 
-        # 线程推理
-        self.thread = self._DetectThread(self.detector, frame)
-        self.thread.finished.connect(self.on_detect_finished)
-        self.thread.start()
+        # 帧写入共享内存，交给推理进程，结果在 poll_results 中取回
+        self._inflight[self.detector.submit(frame.image, frame.ts)] = frame
 
     # 推理结束回调
-    def on_detect_finished(self, img, classIds, confidences, boxes, cost):
+    def on_detect_finished(self, img, classIds, confidences, boxes, cost, skip_ratio=None):
         # 显示图片
         self.show_frame_on_label(img, self.image)
 
         # 显示文字结果
-        lines = [f"🎯 检测完成! 推理时间: {int(cost*1000)}ms\n"]
+        lines = [f"🎯 检测完成! 推理时间: {int(cost*1000)}ms"]
+        if skip_ratio is not None:
+            lines.append(f"♻️ 静止帧复用率: {skip_ratio:.0%}")
+        lines[-1] += "\n"
         lines.append("=" * 40)
         
         if len(classIds) == 0:
@@ -308,7 +333,7 @@ class From3(QWidget, Ui_Form3):
             lines.append(f"🎉 检测到 {len(classIds)} 个目标:")
             lines.append("-" * 30)
             for i, (cid, conf) in enumerate(zip(classIds, confidences)):
-                lines.append(f"{i+1}. 类别: {self.detector.classes[cid]}")
+                lines.append(f"{i+1}. 类别: {self.renderer.names[cid]}")
                 lines.append(f"   序号: {cid}, 置信度: {conf:.3f}")
                 
         lines.append("=" * 40)
@@ -330,10 +355,12 @@ class From3(QWidget, Ui_Form3):
         if hasattr(self, 'timer'):
             self.timer.stop()
         if hasattr(self, 'cap') and self.cap is not None:
-            self.cap.release()
+            self.cap.close()
         if hasattr(self, 'model_thread') and self.model_thread.isRunning():
             self.model_thread.quit()
             self.model_thread.wait()
+        if self.detector is not None:
+            self.detector.close()  # 结束推理进程并释放共享内存
         super().closeEvent(event)
 
     def start_model_loading(self, model_path, label_path, conf_threshold, nms_threshold):
@@ -363,6 +390,8 @@ class From3(QWidget, Ui_Form3):
     def on_model_loaded(self, detector):
         """模型加载完成"""
         self.detector = detector
+        self.renderer = self.model_thread.renderer
+        self._inflight = {}  # seq -> 提交推理的帧
         self.model_loaded = True
         
         # 启用按钮
@@ -384,16 +413,16 @@ class From3(QWidget, Ui_Form3):
         """异步初始化摄像头"""
         try:
             self.update_loading_progress("📷 正在初始化摄像头...")
-            self.cap = cv2.VideoCapture(0)
-            if not self.cap.isOpened():
-                raise RuntimeError("无法打开摄像头")
+            # 订阅进程内共享的摄像头（后台打开、持续取帧），打开失败在 update_video 中提示
+            self.cap = open_camera(0, profile='low-latency')
+            self._shown = None
             
             # 定时器：用于实时刷新 video
             self.timer = QTimer(self)
             self.timer.timeout.connect(self.update_video)
             self.timer.start(30)          # 30ms ≈ 33fps，足够流畅
             
-            self.update_loading_progress("✓ 摄像头初始化完成")
+            self.update_loading_progress("✓ 已订阅共享摄像头")
             
         except Exception as e:
             error_msg = f"摄像头初始化失败: {e}"
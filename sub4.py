@@ -2,12 +2,16 @@
 import sys, cv2
 import numpy as np
 from PyQt5.QtWidgets import QWidget, QApplication, QTextEdit, QLabel, QVBoxLayout
-from PyQt5.QtCore import Qt, QTimer, pyqtSignal, QThread, QRect, QSize
+from PyQt5.QtCore import Qt, QTimer, QRect, QSize
 from PyQt5.QtGui import (QImage, QPixmap, QPainter, QPainterPath, QFont,
                          QRegion, QCursor, QResizeEvent)
 from PyQt5 import QtCore, QtGui
 from ui.seg import Ui_Form4          # ← 你的 ui 文件
 from testseg import YOLOv11Seg       # ← 你的检测类
+from functools import partial
+from utils.camera import open_camera
+from utils.framebus import InferencePool
+from utils.overlay import OverlayRenderer
 
 
 # ---------- 工具：生成带圆角的 QPixmap ----------
@@ -27,23 +31,6 @@ def rounded_pixmap(src: QPixmap, size: QSize, radius: int) -> QPixmap:
     return dst
 
 
-# ---------- 推理线程 ----------
-class InferThread(QThread):
-    infer_done = pyqtSignal(QPixmap, str, str)
-
-    def __init__(self, detector, frame):
-        super().__init__()
-        self.detector = detector
-        self.frame = frame
-
-    def run(self):
-        img, info_f, info_a = self.detector.detect(self.frame)
-        rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb_img.shape
-        qimg = QImage(rgb_img.data, w, h, ch * w, QImage.Format_RGB888)
-        self.infer_done.emit(QPixmap.fromImage(qimg), info_f, info_a)
-
-
 # ---------- 主窗口 ----------
 class Form4(QWidget, Ui_Form4):
     def __init__(self, title="实例分割检测系统"):
@@ -54,16 +41,25 @@ class Form4(QWidget, Ui_Form4):
         self.setAttribute(Qt.WA_TranslucentBackground)
 
         # ---------- 检测器 ----------
-        self.detector = YOLOv11Seg(
+        # 分割模型在独立的推理进程中加载和运行，帧经共享内存传递，界面进程保持流畅
+        self.detector = InferencePool(partial(
+            YOLOv11Seg,
             model_path="driver/bestseg.pt",
             label_path="driver/names2.txt",
             confThreshold=0.45,
             nmsThreshold=0.5,
-            device='cpu'
-        )
+            device='cpu',
+            render=False,         # 绘制在界面进程完成
+            simplify=1.0,         # 轮廓简化容差（像素）
+            motion_gate=None      # 静止帧跳过默认关闭，开启见 utils.motion.MotionGate
+        ))
+        self.renderer = None                # 类别名由推理进程加载模型后传回，首个结果到达时创建
+        self._inflight = {}                 # seq -> 提交推理的帧
 
         # ---------- 摄像头 ----------
-        self.cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
+        # 订阅进程内共享的摄像头，预览与推理都取最新帧，不阻塞界面
+        self.cap = open_camera(0, profile='low-latency')   # Windows 下默认 CAP_DSHOW
+        self._shown = None                  # 当前显示的帧 (image, ts, seq)
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.show_video)
         self.timer.start(30)
@@ -99,6 +95,7 @@ class Form4(QWidget, Ui_Form4):
         # ---------- 缓存 ----------
         self._last_video_pix = QPixmap()
         self._last_image_pix = QPixmap()
+        self._pending_axis = None       # 尚未显示的坐标结果（SegResult）
 
         # ---------- 圆角半径 ----------
         self._radius = 10
@@ -126,36 +123,66 @@ class Form4(QWidget, Ui_Form4):
 
     # ---------- 实时视频 ----------
     def show_video(self):
-        ok, frame = self.cap.read()
-        if ok:
-            self._last_video_pix = self._mat_to_rounded_pixmap(frame, self.video.size())
+        self.poll_results()
+        frame = self.cap.latest()
+        if frame is not None and (self._shown is None or frame.seq != self._shown.seq):
+            self._shown = frame
+            self._last_video_pix = self._mat_to_rounded_pixmap(frame.image, self.video.size())
             self.video.setPixmap(self._last_video_pix)
 
     # ---------- 推理 ----------
     def start_infer(self, ev):
-        ok, frame = self.cap.read()
-        if not ok:
+        frame = self._shown  # 推理画面即当前显示的那一帧
+        if frame is None:
             return
         self.axis.setPlainText("推理中...")
         self.feature.setPlainText("推理中...")
         self.image.clear()
-        self.infer_thread = InferThread(self.detector, frame)
-        self.infer_thread.infer_done.connect(self.show_result)
-        self.infer_thread.start()
-
-    def show_result(self, qpix, info_f, info_a):
+        # 帧写入共享内存交给推理进程，结果在 poll_results 中取回
+        self._inflight[self.detector.submit(frame.image, frame.ts)] = frame
+
+    def poll_results(self):
+        # 非阻塞取回推理结果，在提交时的那一帧上绘制
+        for r in self.detector.poll():
+            frame = self._inflight.pop(r.seq, None)
+            if r.error:                     # 模型加载失败（seq 0）或本帧推理出错
+                self.feature.setPlainText(f"推理失败: {r.error}")
+                continue
+            if frame is None or r.stale:    # 已停止，或帧在推理期间被覆盖
+                continue
+            result = r.result
+            if self.renderer is None:
+                self.renderer = OverlayRenderer(self.detector.names, line_thickness=2)
+            img = self.renderer.draw(frame.image.copy(), result.boxes, result.confidences, result.classIds,
+                                     polygons=result.contours)
+            rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+            h, w, ch = rgb_img.shape
+            qimg = QImage(rgb_img.data, w, h, ch * w, QImage.Format_RGB888)
+            self.show_result(QPixmap.fromImage(qimg), result)
+
+    def show_result(self, qpix, result):
         self._last_image_pix = rounded_pixmap(qpix, self.image.size(), self._radius)
         self.image.setPixmap(self._last_image_pix)
-        self.feature.setPlainText(info_f)
-        self.axis.setPlainText(info_a)
+        self.feature.setPlainText(result.feature_text())
+        # 坐标文本可能有上千行，只在坐标面板可见时才生成
+        self._pending_axis = result
+        self._show_axis()
+
+    def _show_axis(self):
+        if self._pending_axis is not None and self.axis.isVisible():
+            self.axis.setPlainText(self._pending_axis.axis_text())
+            self._pending_axis = None
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._show_axis()
 
     def stop_infer(self, ev):
-        if self.infer_thread and self.infer_thread.isRunning():
-            self.infer_thread.quit()
-            self.infer_thread.wait()
+        self._inflight.clear()              # 未返回的结果直接丢弃
         self.image.clear()
         self.feature.clear()
         self.axis.clear()
+        self._pending_axis = None
         self._set_placeholder()
 
     # ---------- 通用：Mat -> 圆角 QPixmap ----------
@@ -180,7 +207,8 @@ class Form4(QWidget, Ui_Form4):
     # ---------- 优雅退出 ----------
     def closeEvent(self, e):
         self.stop_infer(None)
-        self.cap.release()
+        self.cap.close()
+        self.detector.close()               # 结束推理进程并释放共享内存
         super().closeEvent(e)
 
     # ---------- 以下无边框窗口拖拽/缩放 ----------
@@ -0,0 +1,46 @@
+import numpy as np
+
+from utils.belt import BeltVelocity, CutPointPredictor
+
+
+def tracks(t, v=(120.0, -30.0), outlier=None):
+    # Three crayfish carried by the belt at v px/s, optional track 4 walking against it
+    c = np.array([[100., 200], [300, 220], [500, 180]]) + np.array(v) * t
+    out = [[x - 20, y - 10, x + 20, y + 10, 0.9, 0, i + 1] for i, (x, y) in enumerate(c)]
+    if outlier is not None:
+        x, y = 700 - 400 * t, 200
+        out.append([x - 20, y - 10, x + 20, y + 10, 0.9, 0, 4])
+    return np.array(out)
+
+
+def test_velocity_median_ema():
+    bv = BeltVelocity(alpha=0.5)
+    assert np.allclose(bv.update(tracks(0.0, outlier=True), 0.0), 0)  # no previous frame yet
+    for k in range(1, 6):
+        t = k / 30
+        v = bv.update(tracks(t, outlier=True), t)
+        assert np.allclose(v, (120, -30))  # the median ignores the track walking against the belt
+    assert bv.samples == 5
+
+
+def test_velocity_ema_and_gap():
+    bv = BeltVelocity(alpha=0.5)
+    bv.update(tracks(0.0, (100, 0)), 0.0)
+    assert np.allclose(bv.update(tracks(0.1, (100, 0)), 0.1), (100, 0))  # first sample taken as is
+    bv.update(tracks(0.1, (100, 0)) + [300, 0, 300, 0, 0, 0, 0], 0.2)  # 300 px in 0.1 s -> sample 3000 px/s
+    assert np.allclose(bv.v, (0.5 * 100 + 0.5 * 3000, 0))
+    v = bv.v.copy()
+    assert np.allclose(bv.update(tracks(5.0), 5.0), v)  # gap > max_gap: no sample
+    assert np.allclose(BeltVelocity((50, 0)).update(tracks(1.0), 1.0), (50, 0))  # fixed encoder velocity
+
+
+def test_cut_point_prediction():
+    now = [10.25]
+    p = CutPointPredictor(BeltVelocity((200.0, 0.0)), actuation_delay=0.05, clock=lambda: now[0])
+    assert np.isclose(p.horizon(10.0), 0.3)  # 0.25 s processing + 0.05 s actuation
+    assert np.allclose(p.points([[10, 20]], 10.0), [[70, 20]])
+    b = p.boxes(np.array([[0, 0, 40, 20, 0.9, 1]]), 10.0)
+    assert np.allclose(b, [[60, 0, 100, 20, 0.9, 1]])  # conf/cls columns kept
+    assert p.boxes([], 10.0).shape == (0, 4)
+    c = p.contours([np.zeros((3, 2)), np.ones((0, 2))], 10.0, actuation_ts=10.5)
+    assert np.allclose(c[0], [[100, 0]] * 3) and c[1].shape == (0, 2)
@@ -0,0 +1,117 @@
+import time
+
+import numpy as np
+import pytest
+
+from utils import camera
+from utils.camera import CameraGrabber, open_camera
+
+
+class FakeCapture:
+    # cv2.VideoCapture stand-in delivering `frames` frames (None = endless), then failing every read
+    opened = []
+
+    def __init__(self, *args, frames=None):
+        self.args, self.frames, self.n = args, frames, 0
+        FakeCapture.opened.append(self)
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        time.sleep(0.002)
+        if self.frames is not None and self.n >= self.frames:
+            return False, None
+        self.n += 1
+        return True, np.full((4, 4, 3), self.n % 256, np.uint8)
+
+    def get(self, prop):
+        return 0
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        pass
+
+
+def grabber(frames=None, **kwargs):
+    g = CameraGrabber(0, **kwargs)
+    g._open = lambda: FakeCapture(frames=frames)
+    return g.start()
+
+
+def test_grabber_ring_and_sequence():
+    g = grabber(size=3)
+    try:
+        f = g.wait(0, timeout=2)
+        assert f is not None and f.seq >= 1
+        time.sleep(0.05)
+        last = g.latest()
+        assert last.seq > f.seq and len(g.ring) == 3 and g.get(last.seq) is last
+        assert [x.seq for x in g.ring] == list(range(last.seq - 2, last.seq + 1))
+        assert g.wait(last.seq, timeout=2).seq > last.seq
+    finally:
+        g.close()
+
+
+def test_grabber_stops_after_failed_reads():
+    g = grabber(frames=3, max_fail=5)
+    g.thread.join(timeout=2)
+    assert not g.running and g.error and 'failed reads' in g.error
+    assert g.latest().seq == 3
+    t = time.time()
+    assert g.wait(3, timeout=2) is None and time.time() - t < 0.5  # no hang once stopped
+
+
+@pytest.fixture
+def fake_device(monkeypatch):
+    FakeCapture.opened = []
+    monkeypatch.setattr(camera.cv2, 'VideoCapture', FakeCapture)
+    return FakeCapture.opened
+
+
+def test_registry_shares_device_and_lingers(fake_device):
+    a = open_camera('cam', linger=0.3)
+    b = open_camera('cam')
+    assert len(fake_device) == 1 and a.grabber is b.grabber and a.entry.refs == 2
+    assert a.wait(0, timeout=2) is not None
+    a.close()
+    a.close()  # idempotent
+    assert a.entry.refs == 1
+    b.close()
+    c = open_camera('cam')  # within linger: same device, close cancelled
+    assert len(fake_device) == 1 and c.grabber is a.grabber
+    c.close()
+    time.sleep(0.6)
+    assert 'cam' not in camera._cameras and not a.grabber.running
+    d = open_camera('cam')
+    assert len(fake_device) == 2 and d.grabber is not a.grabber
+    d.close()
+
+
+def test_registry_without_linger_closes_immediately(fake_device):
+    a = open_camera('cam0', linger=0)
+    a.close()
+    assert 'cam0' not in camera._cameras and not a.grabber.running
+
+
+def test_registry_reopens_failed_device(fake_device):
+    a = open_camera('cam1', linger=0)
+    a.grabber.error, a.grabber.running = 'unplugged', False
+    b = open_camera('cam1', linger=0)
+    assert b.grabber is not a.grabber and len(fake_device) == 2
+    a.close()
+    assert camera._cameras['cam1'] is b.entry  # the stale entry does not evict the new one
+    b.close()
+
+
+def test_registry_warns_on_conflicting_settings(fake_device, caplog):
+    a = open_camera('cam2', api=camera.cv2.CAP_ANY, profile='default', linger=0)
+    with caplog.at_level('WARNING', logger='utils.camera'):
+        b = open_camera('cam2', profile='default')
+        assert not caplog.records
+        c = open_camera('cam2', api=camera.cv2.CAP_ANY + 1, profile='hd')
+    assert 'is ignored' in caplog.text
+    for s in (a, b, c):
+        s.close()
@@ -0,0 +1,54 @@
+import cv2
+import numpy as np
+
+from utils.cutgeom import cut_geometry, scale_mask_points
+
+
+def crayfish(shape=(100, 128)):
+    # Synthetic top view, head left: wide cephalothorax x 10..60, narrow waist x 60..66, abdomen x 66..110
+    m = np.zeros(shape, np.uint8)
+    cv2.ellipse(m, (35, 50), (25, 15), 0, 0, 360, 1, -1)
+    m[47:54, 55:67] = 1
+    m[43:58, 66:111] = 1
+    return m
+
+
+def test_head_tail_and_cut():
+    g = cut_geometry(crayfish()[None])
+    assert np.allclose(g['head'][0], (10, 50), atol=2.5) and np.allclose(g['tail'][0], (110, 50), atol=2.5)
+    assert np.allclose(g['direction'][0], (-1, 0), atol=1e-3)  # unit vector tail -> head
+    assert abs(g['length'][0] - 100) < 3
+    (x0, y0), (x1, y1) = g['cut'][0]
+    assert 56 <= x0 <= 68 and 56 <= x1 <= 68 and abs(abs(y1 - y0) - 6) < 3  # across the waist
+    assert 0.25 <= g['cut_pos'][0] <= 0.65
+
+
+def test_orientation_follows_the_mask():
+    m = crayfish((128, 128))
+    g = cut_geometry(np.stack((m[:, ::-1], m.T)))  # mirrored: head right, transposed: head up
+    assert np.allclose(g['head'][0], (117, 50), atol=2.5) and np.allclose(g['direction'][0], (1, 0), atol=1e-3)
+    assert np.allclose(g['head'][1], (50, 10), atol=2.5) and np.allclose(g['direction'][1], (0, -1), atol=1e-3)
+    assert np.allclose(g['cut'][1][:, 1], 61, atol=6)
+
+
+def test_empty_masks():
+    g = cut_geometry(np.zeros((0, 64, 64)))
+    assert g['cut'].shape == (0, 2, 2) and g['center'].shape == (0, 2)
+    g = cut_geometry(np.stack((np.zeros((100, 128)), crayfish())))
+    assert all(np.isfinite(v).all() for v in g.values())
+    assert g['length'][0] == 0 and np.allclose(g['head'][1], (10, 50), atol=2.5)  # empty instance does not disturb
+
+
+def test_scale_back_to_original():
+    # 128x128 letterbox of a 64x128 frame: gain 1, 32 px padding top and bottom
+    assert np.allclose(scale_mask_points(np.array([[10., 40]]), (128, 128), (64, 128)), [[10, 8]])
+    # 64x64 letterbox of a 64x128 frame: gain 0.5, 16 px padding
+    assert np.allclose(scale_mask_points(np.array([[32., 32]]), (64, 64), (64, 128)), [[64, 32]])
+    m = np.zeros((128, 128), np.uint8)
+    m[14:114] = crayfish()
+    a, b = cut_geometry(m[None]), cut_geometry(m[None], orig_shape=(64, 128))
+    for k in 'center', 'head', 'tail', 'cut':
+        assert np.allclose(b[k], scale_mask_points(a[k], (128, 128), (64, 128)))
+    assert np.allclose(b['length'], a['length']) and np.allclose(b['cut_pos'], a['cut_pos'])
+    c = cut_geometry(m[None, ::2, ::2], orig_shape=(64, 128), step=1)  # half-resolution masks, same frame
+    assert np.allclose(c['head'], b['head'], atol=3) and abs(c['length'][0] - b['length'][0]) < 5
@@ -0,0 +1,60 @@
+import time
+
+import numpy as np
+import pytest
+
+from utils import datasets
+from utils.datasets import LoadStreams
+
+
+class FakeStream:
+    # cv2.VideoCapture stand-in: 'live' streams deliver frames forever, 'dead' ones fail after the first frame
+    def __init__(self, url):
+        self.url, self.n = url, 0
+
+    def isOpened(self):
+        return True
+
+    def get(self, prop):
+        return 30.0
+
+    def read(self):
+        time.sleep(0.005)
+        self.n += 1
+        if self.url == 'dead' and self.n > 1:
+            return False, None
+        return True, np.full((48, 64, 3), 100, np.uint8)
+
+    def grab(self):
+        return self.read()[0]
+
+
+@pytest.fixture
+def streams(monkeypatch, tmp_path):
+    monkeypatch.setattr(datasets.cv2, 'VideoCapture', FakeStream)
+    monkeypatch.setattr(datasets.cv2, 'waitKey', lambda *args: -1)
+    f = tmp_path / 'streams.txt'
+    f.write_text('live\ndead\n')
+    return str(f)
+
+
+def test_latest_batch_timestamps_and_blank_dead_stream(streams):
+    ds = iter(LoadStreams(streams, img_size=64, stale=0.2))
+    time.sleep(0.3)
+    _, img, img0, _ = next(ds)
+    assert img.shape == (2, 3, 64, 64) and img.dtype == np.uint8
+    assert img0[0].max() == 100 and img0[1].max() == 0  # failed read blanks the stream
+    age = ds.staleness()
+    assert age[0] < 0.1 and age[1] > 0.2 and ds.is_stale == [False, True]
+    _, img2, _, _ = next(ds)
+    assert img2 is not img and np.shares_memory(img2, ds.batch)  # preallocated double buffer
+
+
+def test_all_mode_does_not_block_on_dead_stream(streams):
+    ds = iter(LoadStreams(streams, img_size=64, drop='all', stale=0.2))
+    next(ds)  # first frames of both streams
+    t = time.time()
+    for _ in range(3):
+        _, img, img0, _ = next(ds)
+    assert time.time() - t < 1.0
+    assert img0[0].max() == 100 and img0[1].max() == 0 and ds.is_stale[1]
@@ -0,0 +1,43 @@
+import torch
+
+from models.experimental import Ensemble
+from utils.general import weighted_boxes_fusion
+
+
+class Member(torch.nn.Module):
+    # Detect() inference output stand-in: (bs, n, 5 + nc) xywh, obj, cls; records the thread count it ran with
+    def __init__(self, boxes):
+        super().__init__()
+        self.boxes = torch.tensor(boxes, dtype=torch.float32)
+        self.threads = None
+
+    def forward(self, x, augment=False):
+        self.threads = torch.get_num_threads()
+        return self.boxes[None].expand(len(x), -1, -1), None
+
+
+def test_wbf_agreement_and_single_member():
+    a = torch.tensor([[10., 10, 50, 50, 0.9, 0], [100, 100, 140, 140, 0.95, 0]])
+    b = torch.tensor([[12., 10, 52, 50, 0.7, 0]])
+    out = weighted_boxes_fusion([a, b])
+    assert len(out) == 2
+    assert torch.allclose(out[0, :5], torch.tensor([10.875, 10, 50.875, 50, 0.8]))  # score-weighted box, mean conf
+    assert abs(out[1, 4] - 0.475) < 1e-6  # only one of two models: halved
+    single = weighted_boxes_fusion([a, b], rescale=False)
+    assert abs(single[0, 4] - 0.95) < 1e-6 and abs(single[1, 4] - 0.8) < 1e-6
+
+
+def test_wbf_empty():
+    assert weighted_boxes_fusion([torch.zeros((0, 6)), torch.zeros((0, 6))]).shape == (0, 6)
+
+
+def test_parallel_keeps_single_member_boxes_and_thread_count():
+    m = Ensemble()
+    m.append(Member([[30, 30, 40, 40, 0.9, 1.0]]))
+    m.append(Member([[30, 30, 40, 40, 0.8, 1.0], [200, 200, 40, 40, 0.95, 1.0]]))
+    n = torch.get_num_threads()
+    m.parallel(threads=[n + 2, n + 2], conf_thres=0.5)
+    y = m(torch.zeros(1, 3, 64, 64))[0]
+    assert torch.get_num_threads() == n and [x.threads for x in m] == [n + 2] * 2
+    conf = sorted(y[0, :, 4].tolist(), reverse=True)
+    assert len(conf) == 2 and abs(conf[0] - 0.95) < 1e-6 and abs(conf[1] - 0.85) < 1e-6  # survives conf_thres 0.5
@@ -0,0 +1,111 @@
+import time
+
+import numpy as np
+import pytest
+
+from utils.framebus import FrameBus, InferencePool
+
+
+class SlowDetector:
+    # detect() stand-in with the YOLOv5Lite return layout
+    classes = ['小龙虾', 'tail']
+
+    def detect(self, img, render=None):
+        time.sleep(0.2)
+        return img, np.array([0]), np.array([0.9]), np.array([[0, 0, img.shape[1], int(img[0, 0, 0])]]), 0.2
+
+
+class BrokenDetector:
+    def __init__(self):
+        raise FileNotFoundError('weights.int8.onnx')
+
+
+class NeverReady:
+    class ready:
+        value = False
+
+
+def frame(v, shape=(48, 64, 3)):
+    return np.full(shape, v, np.uint8)
+
+
+def test_bus_slot_overwrite_and_valid():
+    bus = FrameBus(64 * 48 * 3, slots=2)
+    try:
+        s1 = bus.write(frame(1), ts=10.0)
+        f1 = bus.read(s1)
+        assert f1.image.shape == (48, 64, 3) and f1.image[0, 0, 0] == 1 and f1.ts == 10.0 and bus.valid(f1)
+        s2 = bus.write(frame(2, (10, 20, 3)))
+        assert bus.read(s2).image.shape == (10, 20, 3) and bus.valid(f1)
+        bus.write(frame(3))  # reuses the slot of s1
+        assert not bus.valid(f1) and bus.read(s1) is None and f1.image[0, 0, 0] == 3  # zero-copy view rewritten
+        with pytest.raises(AssertionError):
+            bus.write(frame(0, (100, 100, 3)))
+    finally:
+        bus.close()
+
+
+def test_bus_attach_by_name():
+    bus = FrameBus(16 * 16 * 3, slots=4)
+    other = FrameBus(16 * 16 * 3, slots=4, name=bus.name)
+    try:
+        seq = bus.write(frame(7, (16, 16, 3)))
+        assert other.read(seq).image[0, 0, 0] == 7
+    finally:
+        other.close()
+        bus.close()
+
+
+def test_pool_results_and_stale_flag():
+    pool = InferencePool(SlowDetector, workers=2, slots=2, capacity=64 * 48 * 3)
+    try:
+        assert pool.wait_ready(60) and pool.ready.value == 2 and pool.names == ['小龙虾', 'tail']
+        seq = pool.submit(frame(5))
+        r = pool.get(10)
+        assert r.seq == seq and not r.stale and r.error is None and r.result[2][0, 3] == 5
+        first = pool.submit(frame(1))
+        for v in range(2, 6):  # overwrite the first slot while it is being (or waiting to be) processed
+            pool.submit(frame(v))
+        records = {r.seq: r for r in (pool.get(10) for _ in range(5))}
+        assert records[first].stale
+        assert not records[first + 4].stale
+    finally:
+        pool.close()
+
+
+def test_pool_reports_load_error():
+    pool = InferencePool(BrokenDetector, capacity=16)
+    try:
+        with pytest.raises(RuntimeError, match='weights.int8.onnx'):
+            pool.wait_ready(60)
+    finally:
+        pool.close()
+
+
+def test_pool_names_without_wait_ready():
+    pool = InferencePool(SlowDetector, slots=2, capacity=64 * 48 * 3)
+    try:
+        seq = pool.submit(frame(3))
+        r = pool.get(60)
+        assert r.seq == seq and pool.names == ['小龙虾', 'tail']  # the load record itself is never returned
+    finally:
+        pool.close()
+
+
+def test_pool_load_error_after_exit():
+    pool = InferencePool(BrokenDetector, capacity=16)
+    try:
+        pool.procs[0].join(60)  # the worker has sent its error and exited before wait_ready() looks
+        with pytest.raises(RuntimeError, match='weights.int8.onnx'):
+            pool.wait_ready(60)
+    finally:
+        pool.close()
+
+
+def test_pool_load_timeout():
+    pool = InferencePool(NeverReady, capacity=16, load_timeout=0.5)
+    try:
+        with pytest.raises(RuntimeError, match='not ready'):
+            pool.wait_ready(60)
+    finally:
+        pool.close()
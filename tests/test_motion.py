@@ -0,0 +1,42 @@
+import cv2
+import numpy as np
+
+from utils.motion import MotionGate
+
+
+def belt(rng, shape=(480, 640)):
+    # static textured belt with sensor noise
+    bg = cv2.GaussianBlur(rng.integers(60, 120, (*shape, 3), dtype=np.uint8), (9, 9), 0)
+    return lambda: np.clip(bg.astype(np.int16) + rng.integers(-3, 4, bg.shape), 0, 255).astype(np.uint8)
+
+
+def crayfish(img, x, y, w=120, h=50):
+    cv2.ellipse(img, (x + w // 2, y + h // 2), (w // 2, h // 2), 0, 0, 360, (30, 40, 170), -1)
+    return img
+
+
+def test_static_scene_is_skipped():
+    rng = np.random.default_rng(0)
+    frame, gate = belt(rng), MotionGate()
+    assert gate.changed(frame())
+    assert not any(gate.changed(frame()) for _ in range(20))
+    assert gate.skip_ratio > 0.9
+
+
+def test_small_object_entering_static_scene():
+    rng = np.random.default_rng(1)
+    frame, gate = belt(rng), MotionGate()
+    gate.changed(frame())
+    assert not gate.changed(frame())
+    assert gate.changed(crayfish(frame(), 300, 200))
+
+
+def test_small_objects_moving_are_not_skipped():
+    rng = np.random.default_rng(2)
+    frame, gate = belt(rng), MotionGate()
+    for i in range(30):
+        img = frame()
+        for x, y in ((50, 60), (200, 220), (380, 380)):
+            crayfish(img, x + 10 * i, y)
+        gate.changed(img)
+    assert gate.skip_ratio < 0.1
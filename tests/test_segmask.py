@@ -0,0 +1,27 @@
+import cv2
+import numpy as np
+import torch
+
+from utils.segmask import mask_contours, paste_masks, proto_masks
+
+
+def test_proto_masks_match_full_prototype_product():
+    g = torch.Generator().manual_seed(0)
+    proto, coeffs = torch.randn(32, 40, 40, generator=g), torch.randn(3, 32, generator=g)
+    boxes = torch.tensor([[0., 0., 160., 160.], [33., 47., 101., 90.], [150., 10., 159.5, 30.]])  # input 160x160
+    crops, windows = proto_masks(proto, coeffs, boxes, (160, 160))
+    full = ((coeffs @ proto.view(32, -1)).view(-1, 40, 40) > 0).numpy().astype(np.uint8)
+    assert windows.tolist() == [[0, 0, 40, 40], [8, 11, 26, 23], [37, 2, 40, 8]]
+    for f, c, (x1, y1, x2, y2) in zip(full, crops, windows):
+        assert (c == f[y1:y2, x1:x2]).all()
+    pasted = paste_masks(crops, windows, (40, 40))
+    assert (pasted[0] == full[0]).all() and pasted[1].sum() == crops[1].sum()
+
+
+def test_mask_contours_picks_largest_area():
+    m = np.zeros((1, 64, 64), np.uint8)
+    cv2.rectangle(m[0], (30, 30), (60, 60), 1, -1)  # large blob, 4 points
+    zigzag = np.array([[2 + 2 * i, 2 + 4 * (i % 2)] for i in range(10)] + [[2, 8]], np.int32)
+    cv2.fillPoly(m[0], [zigzag], 1)  # small blob, many points
+    (c,) = mask_contours(m, np.array([[0, 0, 64, 64]]), (64, 64), (64, 64))
+    assert c[:, 0].min() > 29 and c[:, 1].min() > 29
@@ -0,0 +1,78 @@
+import numpy as np
+
+from utils.tracker import ByteTracker, KalmanFilterXYAH, TrackedDetector, xyah2xyxy, xyxy2xyah
+
+
+class Belt:
+    # detect() stand-in: two crayfish moving right at 5 px/frame, frame is the frame index
+    calls = 0
+
+    def detect(self, frame, render=None):
+        self.calls += 1
+        x = 5.0 * frame
+        boxes = np.array([[x, 10, x + 40, 50], [x + 100, 60, x + 140, 120]])
+        return None, np.array([0, 1]), np.array([0.9, 0.8]), boxes, 0.01
+
+
+def det(*boxes, conf=0.9, cls=0):
+    return np.array([[*b, conf, cls] for b in boxes], dtype=np.float64)
+
+
+def test_ids_stable_with_every():
+    d = Belt()
+    t = TrackedDetector(d, every=3)
+    ids = []
+    for i in range(30):
+        out = t.detect(i)
+        assert len(out) == 2
+        out = out[out[:, 0].argsort()]
+        ids.append(out[:, 6].tolist())
+        assert np.allclose(out[:, 5], [0, 1])
+    assert d.calls == 10 and all(x == [1, 2] for x in ids)
+    # the Kalman prediction follows the belt on frames the detector skipped
+    assert abs(out[0, 0] - 5.0 * 29) < 3 and np.allclose(t.tracker.velocity[:, 0], 5.0, atol=0.5)
+
+
+def test_track_lost_after_buffer():
+    t = ByteTracker(max_lost=5)
+    assert t.update(det([0, 0, 40, 40]))[0, 6] == 1
+    for _ in range(5):  # within the buffer: kept, but not reported while unmatched
+        assert len(t.update(det())) == 0 and len(t) == 1
+    assert t.update(det([0, 0, 40, 40]))[0, 6] == 1  # re-found with the same id
+    for _ in range(6):
+        t.update(det())
+    assert len(t) == 0
+    assert t.update(det([0, 0, 40, 40]))[0, 6] == 2  # new id after the track was dropped
+
+
+def test_low_score_rescue_and_new_thresh():
+    t = ByteTracker()
+    t.update(det([0, 0, 40, 40]))
+    out = t.update(det([1, 0, 41, 40], conf=0.3))  # below high_thresh, keeps the existing track alive
+    assert len(out) == 1 and out[0, 6] == 1 and out[0, 4] == 0.3
+    assert len(t.update(det([0, 0, 40, 40], [200, 200, 240, 240], conf=0.55))) == 1  # 0.55 < new_thresh: no new track
+
+
+def test_kalman_batched_matches_single():
+    kf = KalmanFilterXYAH()
+    rng = np.random.default_rng(0)
+    boxes = rng.uniform(0, 100, (5, 2))
+    boxes = np.concatenate((boxes, boxes + rng.uniform(10, 50, (5, 2))), 1)
+    z = xyxy2xyah(boxes)
+    assert np.allclose(xyah2xyxy(z), boxes)
+    mean, cov = kf.initiate(z)
+    mean, cov = kf.predict(mean, cov)
+    z2 = z + rng.normal(0, 1, z.shape)
+    m2, c2 = kf.update(mean, cov, z2)
+    for i in range(5):  # textbook single-track update
+        m, c = mean[i], cov[i]
+        H = np.eye(4, 8)
+        h = m[3]
+        R = np.diag(np.array([h / 20, h / 20, 1e-1, h / 20]) ** 2)
+        S = H @ c @ H.T + R
+        K = c @ H.T @ np.linalg.inv(S)
+        assert np.allclose(m2[i], m + K @ (z2[i] - H @ m))
+        assert np.allclose(c2[i], (np.eye(8) - K @ H) @ c)
+    # constant velocity: predicting moves the centre by the velocity, one frame per step
+    mean[:, 4] = 3.0
+    assert np.allclose(kf.predict(mean, cov)[0][:, 0], mean[:, 0] + 3.0)
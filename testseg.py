@@ -1,86 +1,265 @@
 # -*- coding: utf-8 -*-
 import cv2
 import numpy as np
+import torch
 import time
 from ultralytics import YOLO
 import argparse
+from utils.cutgeom import cut_geometry
+from utils.overlay import OverlayRenderer
+from utils.motion import MotionGate
+from utils.roi import Roi
+from utils.segmask import crop_contours, paste_masks, proto_masks
+
+
+class SegResult:
+    """
+    YOLOv11Seg.detect 的结构化结果，坐标均为整帧像素
+    classIds (n,) int32, confidences (n,) float32, boxes (n,4) int32 xyxy
+    contours  : n 个 (k,2) float32 轮廓数组，模型无掩码输出时为 None
+    cuts      : utils.cutgeom.cut_geometry 的结果（主轴、头/尾端点、头尾切割线），未启用 cut 时为 None
+    cost      : 推理耗时（秒），skip_ratio：静止帧复用率（未启用 motion_gate 时为 None）
+    界面文本由 feature_text() / axis_text() 在需要显示时才生成
+    """
+    def __init__(self, names, data, contours, shape, cost, skip_ratio=None, cuts=None):
+        self.names = names
+        self.boxes = data[:, :4].astype(np.int32)
+        self.confidences = data[:, 4].astype(np.float32)
+        self.classIds = data[:, 5].astype(np.int32)
+        self.contours = contours
+        self.cuts = cuts
+        self.shape = shape
+        self.cost = cost
+        self.skip_ratio = skip_ratio
+
+    def __len__(self):
+        return len(self.classIds)
+
+    def feature_text(self):
+        text = f"推理耗时: {int(self.cost * 1000)} ms\n"
+        if self.skip_ratio is not None:
+            text += f"静止帧复用率: {self.skip_ratio:.0%}\n"
+        text += "类别置信度:\n"
+        return text + "\n".join(f"{self.names[c]}: {conf:.2f}" for c, conf in zip(self.classIds, self.confidences))
+
+    def axis_text(self):
+        # 每个轮廓点一行（归一化坐标），点多时字符串很大，仅在坐标面板显示时调用
+        if self.contours is None:
+            return "无分割掩码"
+        h, w = self.shape[:2]
+        lines = []
+        for c, contour in zip(self.classIds, self.contours):
+            norm = (contour / np.array([[w, h]])).tolist()  # (N,2) / (1,2) -> 归一化
+            lines.append(f"[{self.names[c]}] {len(norm)}个点:")
+            lines += [f"  {i:2d}: ({x:.4f}, {y:.4f})" for i, (x, y) in enumerate(norm, 1)]
+            lines.append("----")  # 分隔符
+        return "\n".join(lines)
 
 
 class YOLOv11Seg:
     """
     基于 ultralytics.YOLO 进行实例分割推理
-    对外接口保持不变:
-    detect(srcimg) -> (out_img, classIds, confidences, boxes, cost_time)
+    detect(srcimg) -> (out_img, SegResult)，轮廓为 numpy 数组，文本仅在显示时生成
+    model_path: .pt 或 ultralytics 导出的 .onnx / .torchscript 等格式
+    render=False 为精简模式：跳过 results.plot() 及掩码绘制，out_img 直接返回原图（无界面节点只需坐标）
+    simplify: 轮廓 Douglas–Peucker 简化容差（像素），0 不简化
+    mask_mode: 'full' 使用 results.masks（掩码上采样到输入尺寸后取轮廓）；
+               'proto' 在原型分辨率（输入的 1/4）下只在各实例框内取轮廓，只把多边形缩放回整帧，
+               耗时随目标面积而非 整帧面积×实例数 增长（替换 ultralytics>=8.3 预测器的 construct_result）
+    cut: 由掩码批量计算每只小龙虾的主轴、头尾分界与切割线（SegResult.cuts），绘制时一并画出切割线
+    imgsz: 推理输入尺寸（导出的固定尺寸模型需与导出时一致），加载时按此尺寸预热一次
+    roi: 传送带区域，矩形 (x1, y1, x2, y2) 或多边形 [(x, y), ...]（原图像素），只对其外接矩形推理，
+         框和轮廓映射回整帧，框中心不在区域内的实例直接丢弃；None 为整帧
+    motion_gate: 静止帧跳过：True、逐像素帧差阈值或 utils.motion.MotionGate，画面无变化时复用上次结果
     """
     def __init__(self,
                  model_path,
                  label_path,
                  confThreshold=0.5,
                  nmsThreshold=0.45,
-                 device='cpu'):
-        # 1. 加载官方 YOLO 实例分割模型
-        self.model = YOLO("driver/bestseg.pt")
+                 device='cpu',
+                 render=True,
+                 imgsz=640,
+                 simplify=0.0,
+                 mask_mode='full',
+                 cut=False,
+                 roi=None,
+                 motion_gate=None):
+        # 1. 加载官方 YOLO 实例分割模型（导出格式无法从权重推断任务类型，显式指定）
+        self.model = YOLO(model_path, task='segment')
         self.device = device                # cpu / cuda
+        self.imgsz = imgsz
+        self.simplify = simplify
+        self.cut = cut
+        assert mask_mode in ('full', 'proto'), f'未知掩码模式 {mask_mode}'
+        self.mask_mode = mask_mode
         # 2. 读类别
         with open(label_path, encoding='utf-8') as f:
             self.classes = [x.strip() for x in f.readlines()]
 
         self.confThreshold = confThreshold
         self.nmsThreshold = nmsThreshold
+        self.render = render
+        self.roi = roi if roi is None or isinstance(roi, Roi) else Roi(roi)
+        if motion_gate is not None and not isinstance(motion_gate, MotionGate):
+            motion_gate = MotionGate() if motion_gate is True else MotionGate(motion_gate)
+        self.gate = motion_gate
+        self._last = None  # 上次推理的 (data, contours)，静止帧复用
+
+        # 3. 预热：首帧不再承担图初始化/内存分配的耗时
+        t0 = time.time()
+        self.model.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, device=device, verbose=False)
+        if mask_mode == 'proto':
+            # 预测器在首次 predict 时创建，之后复用
+            self.model.predictor.construct_result = self._proto_result
+        print(f"[分割] 模型加载+预热完成，耗时 {time.time() - t0:.2f}s")
+        self.renderer = OverlayRenderer(self.classes, line_thickness=2)
 
     # -----------------------------------------------------------
-    def detect(self, srcimg):
+    def _proto_result(self, pred, img, orig_img, img_path, proto):
         """
-        推理单张图，返回与原脚本一致的 5 个值。
-        out_img 使用 Ultralytics 自带 results.plot() 绘制
+        mask_mode='proto' 时替换 SegmentationPredictor.construct_result（ultralytics 8.3 的签名）：
+        掩码只在原型分辨率的框内窗口上计算（不算整幅原型、不上采样），轮廓在框内提取，结果挂在 Results 上；
+        仅 cut=True 时才把框内掩码贴回整幅原型分辨率掩码供 cut_geometry 使用
         """
-        t1 = time.time()
-        results = self.model.predict(
-            srcimg,
+        from ultralytics.engine.results import Results
+        from ultralytics.utils import ops
+        masks, contours = (np.zeros((0, *proto.shape[1:]), dtype=np.uint8) if self.cut else None), []
+        if len(pred):
+            crops, windows = proto_masks(proto, pred[:, 6:], pred[:, :4], img.shape[2:])
+            keep = np.array([c.any() for c in crops], dtype=bool)  # 只保留有掩码的实例，与 ultralytics 一致
+            pred, windows = pred[torch.from_numpy(keep).to(pred.device)], windows[keep]
+            crops = [c for c, k in zip(crops, keep) if k]
+            contours = crop_contours(crops, windows, proto.shape[1:], img.shape[2:], orig_img.shape)
+            if self.cut:
+                masks = paste_masks(crops, windows, proto.shape[1:])
+            pred[:, :4] = ops.scale_boxes(img.shape[2:], pred[:, :4], orig_img.shape)
+        result = Results(orig_img, path=img_path, names=self.model.names, boxes=pred[:, :6])
+        result.proto_masks, result.proto_contours = masks, contours
+        return result
+
+    def _predict(self, frames, imgsz):
+        return self.model.predict(
+            frames,
+            imgsz=imgsz,
             conf=self.confThreshold,
             iou=self.nmsThreshold,
             device=self.device,
             verbose=False
-        )[0]
-        t2 = time.time()
+        )
 
-        # ---------- 提取与原脚本一致的数据 ----------
-        boxes_xyxy, confidences, classIds = [], [], []
-        if results.boxes is not None:
-            for box in results.boxes.data.cpu().numpy():
-                x1, y1, x2, y2, conf, cls = box[:6]
-                boxes_xyxy.append([int(x1), int(y1), int(x2), int(y2)])
-                confidences.append(float(conf))
-                classIds.append(int(cls))
+    def _extract(self, results, shape):
+        # 单张 Results -> (data (n,6), contours, cuts)，坐标为送入模型的图像（整帧 / ROI / 裁剪块）像素
+        data = results.boxes.data.cpu().numpy() if results.boxes is not None else np.zeros((0, 6), np.float32)
+        if self.mask_mode == 'proto':
+            contours, masks = results.proto_contours, results.proto_masks
+        else:
+            contours = results.masks.xy if results.masks is not None else None
+            # 掩码只在计算切割线时才拷回 CPU
+            masks = results.masks.data.cpu().numpy() if self.cut and results.masks is not None else None
+        cuts = cut_geometry(masks, shape[:2]) if self.cut and masks is not None else None
+        if contours is not None and self.simplify:
+            # Douglas–Peucker 简化，点数通常减少一个数量级
+            contours = [cv2.approxPolyDP(p.reshape(-1, 1, 2), self.simplify, True).reshape(-1, 2) if len(p) else p
+                        for p in contours]
+        return data, contours, cuts
 
-        # ---------- 关键：用官方 results.plot() ----------
-        out_img = results.plot()       # 直接返回带框、带掩码的 BGR 图像
+    @staticmethod
+    def _shift(data, contours, cuts, offset, keep):
+        # 平移 (dx, dy) 回整帧坐标，并只保留 keep 选中的实例
+        data = data[keep].copy()
+        data[:, [0, 2]] += offset[0]
+        data[:, [1, 3]] += offset[1]
+        if contours is not None:
+            idx = np.arange(len(contours))[keep]
+            contours = [contours[i] + np.float32(offset) for i in idx]
+        if cuts is not None:
+            cuts = {k: v[keep] + offset if k in ('center', 'head', 'tail', 'cut') else v[keep]
+                    for k, v in cuts.items()}
+        return data, contours, cuts
 
-        # ---------- 新增：生成详细的坐标信息 ----------
-        h, w = srcimg.shape[:2]
-        coord_info_lines = []
-        
-        if results.masks is not None:
-            for idx, contour in enumerate(results.masks.xy):
-                # contour: shape (N,2)  float32 像素坐标
-                norm_pts = contour / np.array([[w, h]])  # (N,2) / (1,2) -> 归一化
-                cls_id = classIds[idx]
-                
-                # 添加类别和点数信息
-                coord_info_lines.append(f"[{self.classes[cls_id]}] {len(norm_pts)}个点:")
-                
-                # 每行显示一个坐标点
-                for i, (x_norm, y_norm) in enumerate(norm_pts):
-                    coord_info_lines.append(f"  {i+1:2d}: ({x_norm:.4f}, {y_norm:.4f})")
-                
-                coord_info_lines.append("----")  # 分隔符
+    def _render(self, srcimg, result, render):
+        # 绘制：框 + 标签 + 掩码一次完成（代替较慢的 results.plot()）
+        if not render:
+            return srcimg
+        out_img = self.renderer.draw(srcimg.copy(), result.boxes, result.confidences, result.classIds,
+                                     polygons=result.contours)
+        if result.cuts is not None:
+            cut = result.cuts['cut'][np.isfinite(result.cuts['cut']).all((1, 2))]  # 级联中未分割出的块为 nan
+            cv2.polylines(out_img, np.round(cut).astype(np.int32), False, (0, 0, 255), 2, cv2.LINE_AA)
+        return out_img
+
+    def draw(self, srcimg, result):
+        # 在 srcimg 的副本上绘制 SegResult（框、标签、轮廓、切割线），用于 render=False 得到的结果
+        return self._render(srcimg, result, True)
+
+    def detect(self, srcimg, render=None):
+        """
+        推理单张图，返回 (out_img, SegResult)
+        out_img 由 OverlayRenderer 一次性绘制框、标签和掩码轮廓
+        """
+        render = self.render if render is None else render
+        frame, offset = self.roi.crop(srcimg) if self.roi is not None else (srcimg, None)
+        if self.gate is not None and not self.gate.changed(frame) and self._last is not None:
+            data, contours, cuts = self._last  # 画面静止，复用上次结果
+            t1 = t2 = time.time()
         else:
-            coord_info_lines.append("无分割掩码")
-            
-        info_feature = f"推理耗时: {int((t2-t1)*1000)} ms\n类别置信度:\n"
-        info_feature += "\n".join([f"{self.classes[c]}: {conf:.2f}" for c, conf in zip(classIds, confidences)])
-        info_axis = "\n".join(coord_info_lines)
-        return out_img, info_feature, info_axis
+            t1 = time.time()
+            results = self._predict(frame, self.imgsz)[0]
+            t2 = time.time()
+
+            data, contours, cuts = self._extract(results, frame.shape)
+            if self.roi is not None:
+                # ROI 内坐标平移回整帧，丢弃区域外的实例
+                keep = self.roi.contains(data[:, :4] + np.tile(offset, 2))
+                data, contours, cuts = self._shift(data, contours, cuts, offset, keep)
+            if self.gate is not None:
+                self._last = data, contours, cuts
+
+        result = SegResult(self.classes, data, contours, srcimg.shape, t2 - t1,
+                           self.gate.skip_ratio if self.gate is not None else None, cuts)
+        return self._render(srcimg, result, render), result
+
+    def segment_crops(self, srcimg, boxes, imgsz=256, margin=0.15, render=None):
+        """
+        检测-分割级联：检测器给出的每个框（整帧像素 xyxy）四周外扩 margin（框宽高的比例）后裁剪，
+        所有裁剪块以小输入尺寸 imgsz 一次批量分割，每块取置信度最高的实例，坐标映射回整帧
+        返回 (out_img, SegResult)，实例与 boxes 一一对应；某块未分割出实例时沿用检测框、轮廓为空
+        """
+        render = self.render if render is None else render
+        h, w = srcimg.shape[:2]
+        b = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        pad = (b[:, 2:] - b[:, :2]) * margin
+        lt = np.clip(np.floor(b[:, :2] - pad), 0, [w, h]).astype(int)
+        rb = np.clip(np.ceil(b[:, 2:] + pad), 0, [w, h]).astype(int)
+        valid = np.nonzero((rb > lt).all(1))[0]
+
+        t1 = time.time()
+        results = self._predict([srcimg[lt[i, 1]:rb[i, 1], lt[i, 0]:rb[i, 0]] for i in valid], imgsz) \
+            if len(valid) else []
+        t2 = time.time()
+
+        data = np.zeros((len(b), 6), dtype=np.float32)
+        data[:, :4] = b
+        contours = [np.zeros((0, 2), dtype=np.float32) for _ in range(len(b))]
+        cuts = None
+        for i, r in zip(valid, results):
+            d, c, g = self._extract(r, (rb[i, 1] - lt[i, 1], rb[i, 0] - lt[i, 0]))
+            if not len(d):
+                continue
+            best = np.arange(len(d)) == d[:, 4].argmax()
+            d, c, g = self._shift(d, c, g, lt[i], best)
+            data[i] = d[0]
+            if c is not None:
+                contours[i] = c[0]
+            if g is not None:
+                if cuts is None:
+                    cuts = {k: np.full((len(b), *v.shape[1:]), np.nan) for k, v in g.items()}
+                for k, v in g.items():
+                    cuts[k][i] = v[0]
+
+        result = SegResult(self.classes, data, contours, srcimg.shape, t2 - t1, None, cuts)
+        return self._render(srcimg, result, render), result
 
 """
 # ----------------- 主程序 -----------------
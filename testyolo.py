@@ -4,8 +4,10 @@ YOLOv5-Lite 实时检测（秒开窗口版）
 模型在后台线程懒加载，不阻塞摄像头窗口
 """
 import argparse
+import ast
 import cv2
 import torch
+import torchvision
 import numpy as np
 import time
 import sys
@@ -25,44 +27,148 @@ if torch.__version__.startswith('2.'):
 # ---------- 复用 detect.py 工具 ----------
 YOLOV5_ROOT = Path('E:/dachuang/YOLOv5-Lite').resolve()
 sys.path.insert(0, str(YOLOV5_ROOT))
-from models.experimental import attempt_load
+from models.experimental import Ensemble, attempt_load
+from models.yolo import Detect
+from utils.datasets import letterbox
 from utils.general import non_max_suppression, scale_coords
-from utils.plots import plot_one_box
-from utils.torch_utils import select_device
+from utils.overlay import OverlayRenderer
+from utils.motion import MotionGate
+from utils.roi import Roi
+from utils.torch_utils import apply_runtime_profile, runtime_profile, select_device
+
+
+# ---------- ONNX Runtime 执行后端 ----------
+class OrtModel:
+    """
+    与 attempt_load 得到的模型同样调用：model(img)[0] -> pred (bs, N, 5+nc)
+    输入尺寸在导出时固化，见 export.py
+    """
+    def __init__(self, onnx_path, device):
+        import onnxruntime as ort
+        so = ort.SessionOptions()
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        providers = ['CPUExecutionProvider']
+        if device.type != 'cpu':
+            providers.insert(0, 'CUDAExecutionProvider')
+        self.session = ort.InferenceSession(str(onnx_path), so, providers=providers)
+        self.device = device
+
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.stride = torch.tensor([float(meta.get('stride', 32))])
+        self.names = ast.literal_eval(meta['names']) if 'names' in meta else None
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        self.input_hw = tuple(inp.shape[2:])  # (h, w)
+
+    def eval(self):
+        return self
+
+    def __call__(self, img, augment=False):
+        pred = self.session.run(None, {self.input_name: img.cpu().numpy()})[0]
+        return torch.from_numpy(pred).to(self.device), None
 
 
 class YOLOv5Lite:
     """
     对外接口保持不变：detect(srcimg) -> (out_img, classIds, confidences, boxes, cost_time)
+    backend: 'torch' 直接加载 .pt；'onnx' 使用 ONNX Runtime（传入 .pt 时自动导出同名 .onnx）；
+             'int8' 加载 quantize.py 生成的 INT8 模型（传入 .pt 时读取同名 .int8.onnx）
+    render : False 时不画框（无界面节点），out_img 为原图，classIds/confidences/boxes 为 numpy 数组；
+             可由 detect(..., render=) 单次覆盖，需要时再用 self.renderer.draw() 绘制
+    model_pt_path 为多个 .pt 的列表时（torch 后端）组成集成模型：各成员并行推理（均分 CPU 线程），加权框融合（WBF）合并结果
+    profile: autotune.py 生成的本机 CPU 运行配置（线程数、channels_last、输入尺寸），CPU + torch 后端启动时自动应用；
+             默认读取权重同目录下的 autotune.json，传入路径指定其他文件，False 关闭
+    tile   : 高分辨率分块推理的块边长（原图像素，按步长取整），帧的长边超过它时 detect 自动分块：
+             相邻块按 tile_overlap 比例重叠，所有块一次批量前向，结果映射回原图后跨块 NMS；None 关闭
+    roi    : 传送带区域，矩形 (x1, y1, x2, y2) 或多边形 [(x, y), ...]（原图像素）；只对其外接矩形推理，
+             坐标映射回整帧，框中心不在区域内的检测直接丢弃；None 为整帧
+    motion_gate: 静止帧跳过（传送带停转、空载）：True、逐像素帧差阈值或 utils.motion.MotionGate；
+             detect 时画面（ROI 内）与上次推理帧几乎无变化则直接复用上次结果（cost=0），跳过比例见 self.gate.skip_ratio
     """
     def __init__(self,
                  model_pt_path,
                  label_path,
                  confThreshold=0.5,
                  nmsThreshold=0.45,
-                 device='cpu'):
+                 device='cpu',
+                 backend='torch',
+                 render=True,
+                 profile=True,
+                 tile=None,
+                 tile_overlap=0.2,
+                 roi=None,
+                 motion_gate=None):
+        assert backend in ('torch', 'onnx', 'int8'), f'未知推理后端 {backend}'
         self.model_pt_path = model_pt_path
         self.label_path    = label_path
         self.confThreshold = confThreshold
         self.nmsThreshold  = nmsThreshold
         self.device        = select_device(device)
+        self.backend       = backend
+        self.render        = render
         self.imgsz         = 640
+        self.input_hw      = None                # 固定输入尺寸的后端（ONNX）为 (h, w)
+        self.channels_last = False               # NHWC 内存布局
+        self.tile          = tile
+        self.tile_overlap  = tile_overlap
+        self.roi           = roi if roi is None or isinstance(roi, Roi) else Roi(roi)
+        if motion_gate is not None and not isinstance(motion_gate, MotionGate):
+            motion_gate = MotionGate() if motion_gate is True else MotionGate(motion_gate)
+        self.gate          = motion_gate
+        self._last         = None                # 上次推理结果（整帧坐标），静止帧复用
         self.ready         = Value('b', False)   # 0=未加载  1=已加载
         self.model         = None
+        self._buf_shape    = None                # 常驻输入缓冲的 (n, h, w)
+        if profile and backend == 'torch' and self.device.type == 'cpu' and isinstance(model_pt_path, (str, Path)):
+            if profile is True:
+                profile = Path(model_pt_path).parent / 'autotune.json'
+            cfg = runtime_profile(profile, model_pt_path)
+            if cfg:
+                # 线程数为进程级设置，需在后台加载、预热之前应用
+                apply_runtime_profile(cfg)
+                self.imgsz, self.channels_last = cfg['imgsz'], cfg['channels_last']
+                print(f"[配置] 应用本机运行配置: {cfg['threads']} 线程, interop {cfg['interop']}, "
+                      f"channels_last={cfg['channels_last']}, imgsz={cfg['imgsz']}")
         # 后台线程加载
         threading.Thread(target=self._lazy_load, daemon=True).start()
 
     # ---------- 后台真正加载 ----------
     def _lazy_load(self):
         t0 = time.time()
-        # fuse=True 去掉 BN，推理更快
-        self.model = attempt_load(self.model_pt_path,
-                                  map_location=self.device)
+        if self.backend == 'int8':
+            onnx_path = Path(self.model_pt_path)
+            if onnx_path.suffix != '.onnx':
+                onnx_path = onnx_path.with_suffix('.int8.onnx')
+            assert onnx_path.exists(), f'{onnx_path} 不存在，请先运行 quantize.py 生成 INT8 模型'
+            self.model = OrtModel(onnx_path, self.device)
+            self.input_hw = self.model.input_hw
+        elif self.backend == 'onnx':
+            onnx_path = Path(self.model_pt_path)
+            if onnx_path.suffix != '.onnx':
+                onnx_path = onnx_path.with_suffix('.onnx')
+                if not onnx_path.exists():
+                    from export import export_onnx
+                    export_onnx(self.model_pt_path, (self.imgsz, self.imgsz), f=onnx_path)
+            self.model = OrtModel(onnx_path, self.device)
+            self.input_hw = self.model.input_hw
+        else:
+            # fuse 去掉 BN，推理更快；cache=True 复用按权重哈希缓存的已融合模型，再次启动无需重新 fuse
+            self.model = attempt_load(self.model_pt_path,
+                                      map_location=self.device,
+                                      cache=True)
+            # Detect 头按置信度阈值先筛选再解码，只解码候选 anchor，NMS 结果与完整解码一致
+            for m in self.model.modules():
+                if isinstance(m, Detect):
+                    m.conf_thres = self.confThreshold
+            if self.channels_last:
+                self.model.to(memory_format=torch.channels_last)
+            if isinstance(self.model, Ensemble):
+                self.model.parallel(conf_thres=self.confThreshold, iou_thres=self.nmsThreshold)
         self.stride = int(self.model.stride.max())
         self.model.eval()
 
         # CPU/GPU 预热一次
-        dummy = torch.zeros(1, 3, self.imgsz, self.imgsz).to(self.device)
+        dummy = torch.zeros(1, 3, *(self.input_hw or (self.imgsz, self.imgsz))).to(self.device)
         self.model(dummy)
 
         # 类别
@@ -70,26 +176,53 @@ class YOLOv5Lite:
             self.classes = [x.strip() for x in f.readlines()]
         self.colors = [[random.randint(0, 255) for _ in range(3)]
                        for _ in self.classes]
+        self.renderer = OverlayRenderer(self.classes, self.colors, line_thickness=2)
 
         self.ready.value = True
         print(f"[后台] 模型加载+预热完成，耗时 {time.time()-t0:.2f}s")
 
-    # ---------- 推理 ----------
-    def detect(self, srcimg):
-        if not self.ready.value:
-            # 模型未就绪，返回原图
-            return srcimg, [], [], [], 0.0
+    # ---------- 常驻输入缓冲 ----------
+    def _input_buffer(self, n, h, w):
+        # 输入形状不变时复用同一块内存（CUDA 下主机端为锁页内存），避免每帧重新分配
+        if self._buf_shape != (n, h, w):
+            host = torch.empty((n, h, w, 3), dtype=torch.uint8)
+            self._host_buf = host.pin_memory() if self.device.type != 'cpu' else host
+            fmt = torch.channels_last if self.channels_last else torch.contiguous_format
+            self._input = torch.empty((n, 3, h, w), dtype=torch.float32, device=self.device, memory_format=fmt)
+            self._buf_shape = (n, h, w)
+        return self._host_buf, self._input
+
+    # ---------- 预处理：letterbox 等比缩放 + 步长对齐填充 ----------
+    def _preprocess(self, frames):
+        # 同尺寸帧取最小矩形填充（auto=True）；尺寸不一致时统一填充到 imgsz 方形以便堆叠
+        # 固定输入尺寸的后端（ONNX）一律填充到导出尺寸
+        if self.input_hw:
+            new_shape, auto = self.input_hw, False
+        else:
+            new_shape, auto = self.imgsz, all(f.shape == frames[0].shape for f in frames)
+        imgs = [letterbox(f, new_shape, auto=auto, stride=self.stride)[0] for f in frames]
+        h, w = imgs[0].shape[:2]
+        host, inp = self._input_buffer(len(imgs), h, w)
+        host_np = host.numpy()
+        for i, im in enumerate(imgs):
+            cv2.cvtColor(im, cv2.COLOR_BGR2RGB, dst=host_np[i])  # BGR->RGB 直接写入缓冲
+        inp.copy_(host.permute(0, 3, 1, 2), non_blocking=True).div_(255.0)  # HWC->CHW, uint8->float
+        return inp
+
+    # ---------- 后处理：（画框） ----------
+    def _postprocess(self, det, srcimg, render):
+        det = det.cpu().numpy()[::-1]  # 置信度升序，与原逐框绘制顺序一致
+        boxes = det[:, :4].astype(np.int32)
+        confidences = det[:, 4].astype(np.float32)
+        classIds = det[:, 5].astype(np.int32)
+        if not render:
+            return srcimg, classIds, confidences, boxes
+        self.renderer.draw(srcimg, boxes, confidences, classIds)
+        return srcimg, classIds.tolist(), confidences.tolist(), boxes.tolist()
 
-        h0, w0 = srcimg.shape[:2]
-        # letterbox
-        img = cv2.resize(srcimg, (self.imgsz, self.imgsz),
-                         interpolation=cv2.INTER_LINEAR)
-        img = img[:, :, ::-1].transpose(2, 0, 1)  # BGR->RGB, HWC->CHW
-        img = np.ascontiguousarray(img)
-        img = torch.from_numpy(img).to(self.device)
-        img = img.float() / 255.0
-        if img.ndimension() == 3:
-            img = img.unsqueeze(0)
+    # ---------- 前向 + NMS，结果还原到各输入图坐标 ----------
+    def _infer(self, frames):
+        img = self._preprocess(frames)  # (N,3,H,W)
 
         t0 = time.time()
         with torch.no_grad():
@@ -98,21 +231,87 @@ class YOLOv5Lite:
                                        self.nmsThreshold, agnostic=True)
         cost = time.time() - t0
 
-        det = pred[0]  # batch_size=1
-        boxes, confidences, classIds = [], [], []
-
-        if len(det):
-            det[:, :4] = scale_coords(img.shape[2:], det[:, :4], srcimg.shape).round()
-            for *xyxy, conf, cls in reversed(det):
-                x1, y1, x2, y2 = map(int, xyxy)
-                boxes.append([x1, y1, x2, y2])
-                confidences.append(float(conf))
-                classIds.append(int(cls))
-                label = f'{self.classes[int(cls)]} {conf:.2f}'
-                plot_one_box(xyxy, srcimg, label=label,
-                             color=self.colors[int(cls)], line_thickness=2)
-
-        return srcimg, classIds, confidences, boxes, cost
+        for det, f in zip(pred, frames):
+            det[:, :4] = scale_coords(img.shape[2:], det[:, :4], f.shape).round()
+        return pred, cost
+
+    # ---------- ROI：只对传送带区域推理，结果映射回整帧并去掉区域外的框 ----------
+    def _crop(self, srcimg):
+        return self.roi.crop(srcimg) if self.roi is not None else (srcimg, None)
+
+    def _uncrop(self, det, offset):
+        return self.roi.restore(det, offset) if self.roi is not None else det
+
+    # ---------- 推理 ----------
+    def detect(self, srcimg, render=None):
+        render = self.render if render is None else render
+        if not self.ready.value:
+            # 模型未就绪，返回原图
+            return srcimg, [], [], [], 0.0
+
+        frame, offset = self._crop(srcimg)
+        if self.gate is not None and not self.gate.changed(frame) and self._last is not None:
+            return (*self._postprocess(self._last, srcimg, render), 0.0)  # 画面静止，复用上次结果
+
+        if self.tile and max(frame.shape[:2]) > self.tile:
+            det, cost = self._infer_tiled(frame)
+        else:
+            pred, cost = self._infer([frame])
+            det = pred[0]  # batch_size=1
+        det = self._uncrop(det, offset)
+        if self.gate is not None:
+            self._last = det
+        return (*self._postprocess(det, srcimg, render), cost)
+
+    # ---------- 分块推理（2~4K 产线相机，小目标） ----------
+    def _tiles(self, h, w):
+        # 块左上角坐标：边长按步长取整，步进 = 边长 × (1 - 重叠) 按步长取整，最后一块贴齐图像边缘
+        t = max(self.tile // self.stride, 1) * self.stride
+        step = max(int(t * (1 - self.tile_overlap)) // self.stride, 1) * self.stride
+        ys = list(range(0, max(h - t, 0), step)) + [max(h - t, 0)]
+        xs = list(range(0, max(w - t, 0), step)) + [max(w - t, 0)]
+        return t, [(x, y) for y in ys for x in xs]
+
+    def _infer_tiled(self, frame):
+        t, origins = self._tiles(*frame.shape[:2])
+        pred, cost = self._infer([frame[y:y + t, x:x + t] for x, y in origins])  # 所有块一次批量前向
+
+        t0 = time.time()
+        # 各块坐标平移回整图，再做跨块 NMS 去掉重叠区的重复框
+        for det, (x, y) in zip(pred, origins):
+            det[:, [0, 2]] += x
+            det[:, [1, 3]] += y
+        det = torch.cat(pred)
+        det = det[torchvision.ops.nms(det[:, :4], det[:, 4], self.nmsThreshold)[:300]]
+        return det, cost + time.time() - t0
+
+    def detect_tiled(self, srcimg, render=None):
+        render = self.render if render is None else render
+        if not self.ready.value:
+            return srcimg, [], [], [], 0.0
+        frame, offset = self._crop(srcimg)
+        det, cost = self._infer_tiled(frame)
+        return (*self._postprocess(self._uncrop(det, offset), srcimg, render), cost)
+
+    # ---------- 批量推理（多路相机一次前向） ----------
+    def detect_batch(self, frames, render=None):
+        """
+        frames: 多路相机的 BGR 图像列表，一次前向 + 一次 NMS
+        返回与 detect 相同结构的列表：[(out_img, classIds, confidences, boxes, cost), ...]
+        cost 为整批耗时按帧数均摊后的单帧耗时
+        """
+        render = self.render if render is None else render
+        if not len(frames):
+            return []
+        if not self.ready.value:
+            return [(f, [], [], [], 0.0) for f in frames]
+
+        crops = [self._crop(f) for f in frames]
+        pred, cost = self._infer([c for c, _ in crops])
+        cost /= len(frames)
+
+        return [(*self._postprocess(self._uncrop(det, offset), f, render), cost)
+                for det, (_, offset), f in zip(pred, crops, frames)]
 
 """
 # ----------------- 主程序 -----------------
@@ -1,18 +1,27 @@
 # app.py
 from flask import Flask, Response
 from flask_cors import CORS
+import sys
 import cv2
 
+sys.path.append('./')  # 在仓库根目录运行 python use/detection.py
+from utils.camera import open_camera
+
 app = Flask(__name__)
 CORS(app)          # 允许跨域，方便前端直接嵌入
-cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)  # Windows 用 CAP_DSHOW 更快
-# Linux 直接 cv2.VideoCapture(0)
+# 订阅进程内共享的摄像头，所有观看的客户端共享同一份最新帧
+cap = open_camera(0, profile='low-latency')  # 后端默认 utils.camera.CAMERA_API：Windows 用 CAP_DSHOW 更快，其他平台 CAP_ANY
 
 def gen_frames():
+    seq = 0
     while True:
-        success, frame = cap.read()
-        if not success:
-            break
+        f = cap.wait(seq)  # 等待比上次更新的一帧，慢客户端自动跳帧
+        if f is None:
+            if cap.error or not cap.running:
+                break
+            continue
+        seq = f.seq
+        frame = f.image
         # 可在此处做图像处理，例如：
         # frame = cv2.flip(frame, 1)
         _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
@@ -0,0 +1,78 @@
+# Conveyor belt utils: belt velocity estimation and latency compensation of cut points
+# Timestamps are time.monotonic() seconds taken when the frame was captured
+
+import time
+
+import numpy as np
+
+
+class BeltVelocity:
+    # Belt velocity (vx, vy) in pixels/second. Either fixed (e.g. from the belt encoder) or estimated from tracked
+    # objects: every crayfish on the belt moves with it, so the median displacement rate of tracks seen on two
+    # consecutive updates is a robust per-frame sample, smoothed with an exponential moving average
+    def __init__(self, velocity=None, alpha=0.2, max_gap=1.0):
+        self.fixed = velocity is not None
+        self.v = np.zeros(2) if velocity is None else np.asarray(velocity, dtype=np.float64)
+        self.alpha = alpha  # EMA weight of a new sample
+        self.max_gap = max_gap  # seconds, older previous positions are not used
+        self.prev = {}  # track_id -> (cx, cy)
+        self.prev_ts = None
+        self.samples = 0
+
+    def update(self, tracks, ts):
+        # tracks: (n, 7) [x1, y1, x2, y2, conf, cls, track_id] (utils.tracker), ts: capture timestamp of the frame
+        if self.fixed:
+            return self.v
+        tracks = np.asarray(tracks, dtype=np.float64).reshape(-1, 7)
+        c = (tracks[:, :2] + tracks[:, 2:4]) / 2
+        ids = tracks[:, 6].astype(np.int64)
+        if self.prev_ts is not None and 0 < ts - self.prev_ts <= self.max_gap:
+            d = [c[i] - self.prev[k] for i, k in enumerate(ids) if k in self.prev]
+            if d:
+                v = np.median(np.array(d), 0) / (ts - self.prev_ts)
+                self.v = v if not self.samples else (1 - self.alpha) * self.v + self.alpha * v
+                self.samples += 1
+        self.prev, self.prev_ts = dict(zip(ids.tolist(), c)), ts
+        return self.v
+
+
+class CutPointPredictor:
+    """Projects detections to where they will be when the cutter actuates.
+
+    A result describes the scene at capture time, the cut happens at capture_ts + elapsed processing time (measured
+    at predict time) + actuation_delay (robot dispatch and motion, configured). Positions are shifted by belt
+    velocity x that horizon.
+
+    Usage:
+        predictor = CutPointPredictor(BeltVelocity(), actuation_delay=0.08)
+        predictor.velocity.update(tracker.update(det), ts)
+        boxes = predictor.boxes(boxes, ts); contours = predictor.contours(contours, ts)
+    """
+
+    def __init__(self, velocity=None, actuation_delay=0.0, clock=time.monotonic):
+        self.velocity = velocity if isinstance(velocity, BeltVelocity) else BeltVelocity(velocity)
+        self.actuation_delay = actuation_delay
+        self.clock = clock
+
+    def horizon(self, capture_ts, actuation_ts=None):
+        # Seconds between capture and actuation
+        return (self.clock() + self.actuation_delay if actuation_ts is None else actuation_ts) - capture_ts
+
+    def offset(self, capture_ts, actuation_ts=None):
+        # (dx, dy) pixel shift accumulated by the belt until actuation
+        return self.velocity.v * self.horizon(capture_ts, actuation_ts)
+
+    def points(self, points, capture_ts, actuation_ts=None):
+        # (..., 2) xy points -> predicted positions
+        return np.asarray(points, dtype=np.float64) + self.offset(capture_ts, actuation_ts)
+
+    def boxes(self, boxes, capture_ts, actuation_ts=None):
+        # (n, >=4) xyxy boxes -> predicted boxes (extra columns such as conf/cls are kept)
+        boxes = np.array(boxes, dtype=np.float64).reshape(-1, np.shape(boxes)[-1] if len(boxes) else 4)
+        boxes[:, :4] += np.tile(self.offset(capture_ts, actuation_ts), 2)
+        return boxes
+
+    def contours(self, contours, capture_ts, actuation_ts=None):
+        # list of (k, 2) contours (YOLOv11Seg masks) -> predicted contours, one shared offset
+        d = self.offset(capture_ts, actuation_ts)
+        return [np.asarray(c, dtype=np.float64) + d for c in contours]
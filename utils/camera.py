@@ -0,0 +1,257 @@
+# Camera utils: frames are grabbed on a dedicated thread and shared with preview, inference and streaming consumers
+
+import logging
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+CAMERA_API = cv2.CAP_DSHOW if sys.platform == 'win32' else cv2.CAP_ANY  # DirectShow opens much faster on Windows
+Frame = namedtuple('Frame', 'image ts seq')  # BGR image, time.monotonic() at capture, 1-based sequence number
+
+# Named capture profiles. Driver defaults are usually uncompressed YUYV at a reduced frame rate with a multi-frame
+# internal buffer; MJPG keeps the USB link at full frame rate and a 1-frame buffer removes queueing latency.
+# None = leave the driver default
+CAPTURE_PROFILES = {
+    'default': {},
+    'low-latency': dict(fourcc='MJPG', width=640, height=480, fps=30, buffersize=1),
+    'hd': dict(fourcc='MJPG', width=1280, height=720, fps=30, buffersize=1),
+    'full-hd': dict(fourcc='MJPG', width=1920, height=1080, fps=30, buffersize=1),
+}
+
+
+def apply_capture_profile(cap, profile='low-latency', verbose=True):
+    """Apply a capture profile to an opened cv2.VideoCapture and probe the settings the driver actually accepted.
+
+    Args:
+        cap: opened cv2.VideoCapture
+        profile: CAPTURE_PROFILES name or dict with any of fourcc, width, height, fps, buffersize
+        verbose: print requested vs. achieved settings
+
+    Returns:
+        dict of achieved settings: fourcc, width, height, fps, buffersize (None where the backend does not report it)
+    """
+    p = CAPTURE_PROFILES[profile] if isinstance(profile, str) else dict(profile or {})
+    if p.get('fourcc'):  # before the size, some backends reset the format on a size change otherwise
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*p['fourcc']))
+    for k, prop in (('width', cv2.CAP_PROP_FRAME_WIDTH), ('height', cv2.CAP_PROP_FRAME_HEIGHT),
+                    ('fps', cv2.CAP_PROP_FPS), ('buffersize', cv2.CAP_PROP_BUFFERSIZE)):
+        if p.get(k):
+            cap.set(prop, p[k])
+    achieved = probe_capture(cap)
+    if verbose:
+        missed = [k for k, v in p.items() if v and achieved.get(k) is not None and achieved[k] != v]
+        print(f'Capture profile {profile if isinstance(profile, str) else p}: {capture_info(achieved)}' +
+              (f" (not accepted: {', '.join(missed)})" if missed else ''))
+    return achieved
+
+
+def probe_capture(cap):
+    # Settings reported by the backend, width/height taken from a real frame when one can be read
+    def get(prop):
+        v = cap.get(prop)
+        return v if v > 0 else None
+
+    code = int(get(cv2.CAP_PROP_FOURCC) or 0)
+    fourcc = ''.join(chr((code >> 8 * i) & 0xFF) for i in range(4)).strip('\x00 ') or None
+    w, h = get(cv2.CAP_PROP_FRAME_WIDTH), get(cv2.CAP_PROP_FRAME_HEIGHT)
+    ok, img = cap.read()
+    if ok:
+        h, w = img.shape[:2]
+    b = get(cv2.CAP_PROP_BUFFERSIZE)
+    return {'fourcc': fourcc, 'width': w and int(w), 'height': h and int(h), 'fps': get(cv2.CAP_PROP_FPS),
+            'buffersize': b and int(b)}
+
+
+def capture_info(s):
+    # Achieved settings -> 'MJPG 640x480 at 30.00 FPS, buffer 1'
+    fps = f"{s['fps']:.2f}" if s.get('fps') else '?'
+    return f"{s.get('fourcc') or '?'} {s.get('width') or '?'}x{s.get('height') or '?'} at {fps} FPS, " \
+           f"buffer {s.get('buffersize') or '?'}"
+
+
+class CameraGrabber:
+    # Opens the device and reads it continuously on a daemon thread into a ring of the last `size` frames.
+    # Every read returns a new array that is never written again, so consumers share frames without copying and a
+    # frame held by a slow consumer (inference) stays valid. latest() never blocks; wait() blocks for a newer frame.
+    # profile: CAPTURE_PROFILES name/dict applied at open, the achieved settings are in self.settings.
+    # After max_fail consecutive failed reads (device unplugged, stream ended) error is set and the grabber stops
+    def __init__(self, source=0, api=cv2.CAP_ANY, size=4, profile=None, max_fail=50):
+        self.source, self.api, self.profile, self.max_fail = source, api, profile, max_fail
+        self.settings = None
+        self.ring = deque(maxlen=size)
+        self.cond = threading.Condition()
+        self.opened = threading.Event()  # set once the device is open (or failed to open, see self.error)
+        self.error = None
+        self.seq = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        return self
+
+    def _open(self):
+        return cv2.VideoCapture(self.source, self.api)
+
+    def _run(self):
+        cap = self._open()
+        if not cap.isOpened():
+            self.error = f'Failed to open camera {self.source}'
+            self.running = False
+            self.opened.set()
+            with self.cond:
+                self.cond.notify_all()
+            return
+        if self.profile is not None:
+            self.settings = apply_capture_profile(cap, self.profile)
+        self.opened.set()
+        fail = 0
+        while self.running:
+            ok, img = cap.read()
+            ts = time.monotonic()
+            if not ok:
+                fail += 1
+                if fail >= self.max_fail:
+                    self.error = f'Camera {self.source} stopped delivering frames ({fail} failed reads)'
+                    break
+                time.sleep(0.01)
+                continue
+            fail = 0
+            with self.cond:
+                self.seq += 1
+                self.ring.append(Frame(img, ts, self.seq))
+                self.cond.notify_all()
+        cap.release()
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+
+    def latest(self):
+        # Newest Frame or None, non-blocking
+        return self.ring[-1] if self.ring else None
+
+    def get(self, seq):
+        # Frame with sequence number seq if still in the ring, else None
+        for f in reversed(self.ring):
+            if f.seq == seq:
+                return f
+        return None
+
+    def wait(self, after=0, timeout=1.0):
+        # Block until a frame newer than sequence number `after` exists and return the newest, None on timeout/error
+        with self.cond:
+            self.cond.wait_for(lambda: self.seq > after or not self.running, timeout)
+            f = self.latest()
+        return f if f is not None and f.seq > after else None
+
+    def close(self):
+        self.running = False
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+
+
+class CameraSubscription:
+    # A consumer's handle on a shared CameraGrabber (see open_camera); close() drops the reference
+    def __init__(self, entry):
+        self.entry = entry
+        self.grabber = entry.grabber
+        self.closed = False
+
+    def latest(self):
+        return self.grabber.latest()
+
+    def get(self, seq):
+        return self.grabber.get(seq)
+
+    def wait(self, after=0, timeout=1.0):
+        return self.grabber.wait(after, timeout)
+
+    @property
+    def error(self):
+        return self.grabber.error
+
+    @property
+    def settings(self):
+        return self.grabber.settings
+
+    @property
+    def running(self):
+        return self.grabber.running and not self.closed
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            _release(self.entry)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class _Camera:
+    # Registry entry: one grabber per device and the number of open subscriptions
+    def __init__(self, source, grabber, linger, profile):
+        self.source, self.grabber, self.linger, self.profile = source, grabber, linger, profile
+        self.refs = 0
+        self.timer = None
+
+
+_cameras = {}  # source -> _Camera
+_cameras_lock = threading.Lock()
+
+
+def open_camera(source=0, api=None, size=4, linger=5.0, profile=None):
+    """Subscribe to a process-wide shared camera, opening the device in the background on first use.
+
+    Every window/stream subscribes to the same CameraGrabber instead of opening its own cv2.VideoCapture, so a
+    second consumer neither fails nor fights for the device. The device is closed `linger` seconds after the last
+    subscription is closed, which makes switching between windows instant. `api` (None = CAMERA_API), `size` and
+    `profile` (see CAPTURE_PROFILES) only apply to the subscription that opens the device; a later subscription
+    asking for a different api or profile gets the open device and a warning.
+    """
+    with _cameras_lock:
+        e = _cameras.get(source)
+        if e is None or e.grabber.error or not e.grabber.running:  # first use or the device failed/was closed
+            g = CameraGrabber(source, CAMERA_API if api is None else api, size, profile).start()
+            e = _cameras[source] = _Camera(source, g, linger, profile)
+        elif (api is not None and api != e.grabber.api) or (profile is not None and profile != e.profile):
+            logger.warning(f'Camera {source} is already open with api {e.grabber.api}, profile {e.profile}; '
+                           f'requested api {api}, profile {profile} is ignored')
+        if e.timer is not None:
+            e.timer.cancel()
+            e.timer = None
+        e.refs += 1
+        return CameraSubscription(e)
+
+
+def _release(e):
+    with _cameras_lock:
+        e.refs -= 1
+        if e.refs > 0:
+            return
+        if e.linger > 0:
+            e.timer = threading.Timer(e.linger, _close_idle, (e,))
+            e.timer.daemon = True
+            e.timer.start()
+            return
+    _close_idle(e)
+
+
+def _close_idle(e):
+    with _cameras_lock:
+        if e.refs > 0:
+            return
+        if _cameras.get(e.source) is e:
+            del _cameras[e.source]
+        e.timer = None
+    e.grabber.close()
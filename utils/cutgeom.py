@@ -0,0 +1,94 @@
+# Cut geometry utils: principal axis, head/tail ends and head/tail cut line of every crayfish mask in one pass
+
+import numpy as np
+
+
+def scale_mask_points(p, mask_shape, orig_shape):
+    # (..., 2) xy points in letterboxed mask space (H, W) -> original frame pixels (h0, w0)
+    gain = min(mask_shape[0] / orig_shape[0], mask_shape[1] / orig_shape[1])
+    pad = np.array([(mask_shape[1] - orig_shape[1] * gain) / 2, (mask_shape[0] - orig_shape[0] * gain) / 2])
+    return (p - pad) / gain
+
+
+def cut_geometry(masks, orig_shape=None, bins=32, window=(0.25, 0.65), step=2):
+    """Head/tail cut lines for a batch of instance masks, without per-instance python loops.
+
+    The principal axis comes from the second-order mask moments. Mask pixels are projected on the axis and binned
+    into a width profile; the head end is the one whose half of the body is wider (cephalothorax vs. abdomen),
+    and the cut is placed at the narrowest smoothed width inside `window` (fractions of body length from the head).
+
+    Args:
+        masks: (n, H, W) bool/float masks, e.g. results.masks.data
+        orig_shape: (h0, w0) frame shape the masks were letterboxed from (results.masks.orig_shape), None = mask space
+        bins: width profile resolution along the body
+        step: pixel subsampling of the masks
+
+    Returns:
+        dict of float arrays in frame pixels: center (n,2), direction (n,2) unit vector tail->head, length (n,),
+        head (n,2), tail (n,2), cut (n,2,2) cut line end points, cut_pos (n,) cut position as fraction from the head
+    """
+    masks = np.asarray(masks)
+    n, H, W = masks.shape
+    out = {'center': np.zeros((n, 2)), 'direction': np.zeros((n, 2)), 'length': np.zeros(n), 'head': np.zeros((n, 2)),
+           'tail': np.zeros((n, 2)), 'cut': np.zeros((n, 2, 2)), 'cut_pos': np.zeros(n)}
+    if not n:
+        return out
+
+    m = masks[:, ::step, ::step] > 0.5
+    ys, xs = np.arange(0, H, step, dtype=np.float64), np.arange(0, W, step, dtype=np.float64)
+    mf = m.astype(np.float32)
+    area = np.maximum(mf.sum((1, 2)), 1)
+    px, py = mf.sum(1) @ xs, mf.sum(2) @ ys  # first moments
+    cx, cy = px / area, py / area
+    sxx = mf.sum(1) @ xs ** 2 / area - cx ** 2
+    syy = mf.sum(2) @ ys ** 2 / area - cy ** 2
+    sxy = np.einsum('nhw,h,w->n', mf, ys, xs) / area - cx * cy
+    theta = 0.5 * np.arctan2(2 * sxy, sxx - syy)  # principal axis angle
+    u = np.stack((np.cos(theta), np.sin(theta)), 1)  # axis
+    v = np.stack((-u[:, 1], u[:, 0]), 1)  # normal
+
+    # all mask pixels of all instances in axis coordinates t (along), s (across)
+    i, yi, xi = np.nonzero(m)
+    dx, dy = xs[xi] - cx[i], ys[yi] - cy[i]
+    t = dx * u[i, 0] + dy * u[i, 1]
+    s = dx * v[i, 0] + dy * v[i, 1]
+    tmin, tmax = np.full(n, np.inf), np.full(n, -np.inf)
+    np.minimum.at(tmin, i, t)
+    np.maximum.at(tmax, i, t)
+    empty = ~np.isfinite(tmin)
+    tmin[empty], tmax[empty] = 0, 0
+    length = tmax - tmin
+
+    # width profile (n, bins) from the across-axis extent of every bin
+    b = np.clip(((t - tmin[i]) / np.maximum(length[i], 1e-6) * bins).astype(np.int64), 0, bins - 1)
+    key = i * bins + b
+    smin, smax = np.full(n * bins, np.inf), np.full(n * bins, -np.inf)
+    np.minimum.at(smin, key, s)
+    np.maximum.at(smax, key, s)
+    width = np.where(np.isfinite(smin), smax - smin, 0).reshape(n, bins)
+
+    # head at the wider half, profile re-ordered to run from the head
+    head_hi = width[:, bins // 2:].mean(1) > width[:, :bins // 2].mean(1)  # head at the tmax end
+    prof = np.where(head_hi[:, None], width[:, ::-1], width)
+    prof = np.pad(prof, ((0, 0), (1, 1)), mode='edge')
+    prof = (prof[:, :-2] + 2 * prof[:, 1:-1] + prof[:, 2:]) / 4  # smooth
+    lo, hi = int(window[0] * bins), max(int(window[1] * bins), int(window[0] * bins) + 1)
+    k = lo + prof[:, lo:hi].argmin(1)  # cut bin counted from the head
+    cut_pos = (k + 0.5) / bins
+
+    sign = np.where(head_hi, 1., -1.)
+    t_head = np.where(head_hi, tmax, tmin)
+    t_cut = t_head - sign * cut_pos * length
+    kb = np.where(head_hi, bins - 1 - k, k)  # cut bin in tmin->tmax order
+    s0, s1 = smin.reshape(n, bins)[np.arange(n), kb], smax.reshape(n, bins)[np.arange(n), kb]
+    s0, s1 = np.where(np.isfinite(s0), s0, 0), np.where(np.isfinite(s1), s1, 0)
+
+    c = np.stack((cx, cy), 1)
+    p = c + u * t_cut[:, None]
+    cut = np.stack((p + v * s0[:, None], p + v * s1[:, None]), 1)
+    head, tail = c + u * t_head[:, None], c + u * np.where(head_hi, tmin, tmax)[:, None]
+    if orig_shape is not None and tuple(orig_shape[:2]) != (H, W):
+        c, head, tail, cut = (scale_mask_points(x, (H, W), orig_shape) for x in (c, head, tail, cut))
+        length = length / min(H / orig_shape[0], W / orig_shape[1])
+    out.update(center=c, direction=u * sign[:, None], length=length, head=head, tail=tail, cut=cut, cut_pos=cut_pos)
+    return out
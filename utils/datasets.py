@@ -10,7 +10,8 @@ import time
 from itertools import repeat
 from multiprocessing.pool import ThreadPool
 from pathlib import Path
-from threading import Thread
+from queue import Empty, Queue
+from threading import Condition, Thread
 
 import cv2
 import numpy as np
@@ -20,6 +21,7 @@ from PIL import Image, ExifTags
 from torch.utils.data import Dataset
 from tqdm import tqdm
 
+from utils.camera import apply_capture_profile, capture_info
 from utils.general import check_requirements, xyxy2xywh, xywh2xyxy, xywhn2xyxy, xyn2xy, segment2box, segments2boxes, \
     resample_segments, clean_str
 from utils.torch_utils import torch_distributed_zero_first
@@ -200,7 +202,7 @@ class LoadImages:  # for inference
 
 
 class LoadWebcam:  # for inference
-    def __init__(self, pipe='0', img_size=640, stride=32):
+    def __init__(self, pipe='0', img_size=640, stride=32, profile=None):
         self.img_size = img_size
         self.stride = stride
 
@@ -212,7 +214,10 @@ class LoadWebcam:  # for inference
 
         self.pipe = pipe
         self.cap = cv2.VideoCapture(pipe)  # video capture object
-        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 3)  # set buffer size
+        if profile is not None:  # utils.camera.CAPTURE_PROFILES name or dict
+            apply_capture_profile(self.cap, profile)
+        else:
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 3)  # set buffer size
 
     def __iter__(self):
         self.count = -1
@@ -258,10 +263,20 @@ class LoadWebcam:  # for inference
 
 
 class LoadStreams:  # multiple IP or RTSP cameras
-    def __init__(self, sources='streams.txt', img_size=640, stride=32):
+    # Reader threads block on cap.read() and keep the newest frame of every stream with its time.monotonic() capture
+    # timestamp. __next__ waits for new frames and letterboxes all streams in parallel into a preallocated batch.
+    #   drop: 'latest' newest frame only, 'every' decode every `every`-th frame (the rest are grabbed and dropped),
+    #         'all' every frame in order (readers block on a `buffer`-deep queue instead of dropping)
+    #   stale: seconds without a new frame after which a stream is reported stale, see staleness(); a failed read
+    #          blanks the stream's frame as before, and in 'all' mode a stream without a frame within `stale` seconds
+    #          contributes a blank frame instead of blocking the batch (is_stale marks those streams)
+    def __init__(self, sources='streams.txt', img_size=640, stride=32, profile=None, drop='latest', every=4,
+                 buffer=32, stale=1.0):
+        assert drop in ('latest', 'every', 'all'), f'Invalid drop policy {drop}, use latest, every or all'
         self.mode = 'stream'
         self.img_size = img_size
         self.stride = stride
+        self.drop, self.every, self.stale = drop, every, stale
 
         if os.path.isfile(sources):
             with open(sources, 'r') as f:
@@ -270,7 +285,9 @@ class LoadStreams:  # multiple IP or RTSP cameras
             sources = [sources]
 
         n = len(sources)
-        self.imgs = [None] * n
+        self.imgs, self.ts, self.seq, self.fps = [None] * n, np.zeros(n), [0] * n, [0.] * n
+        self.queues = [Queue(maxsize=buffer) for _ in range(n)]  # drop='all' only
+        self.cond = Condition()
         self.sources = [clean_str(x) for x in sources]  # clean source names for later
         for i, s in enumerate(sources):
             # Start the thread to read frames from the video stream
@@ -282,13 +299,18 @@ class LoadStreams:  # multiple IP or RTSP cameras
                 url = pafy.new(url).getbest(preftype="mp4").url
             cap = cv2.VideoCapture(url)
             assert cap.isOpened(), f'Failed to open {s}'
+            if profile is not None:  # utils.camera.CAPTURE_PROFILES name or dict, same profile for every stream
+                info = capture_info(apply_capture_profile(cap, profile, verbose=False))
             w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
             h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            self.fps = cap.get(cv2.CAP_PROP_FPS) % 100
+            self.fps[i] = cap.get(cv2.CAP_PROP_FPS) % 100
 
             _, self.imgs[i] = cap.read()  # guarantee first frame
+            self.ts[i] = time.monotonic()
+            if drop == 'all':
+                self.queues[i].put((self.imgs[i], self.ts[i]))
             thread = Thread(target=self.update, args=([i, cap]), daemon=True)
-            print(f' success ({w}x{h} at {self.fps:.2f} FPS).')
+            print(f' success ({info if profile is not None else f"{w}x{h} at {self.fps[i]:.2f} FPS"}).')
             thread.start()
         print('')  # newline
 
@@ -297,19 +319,42 @@ class LoadStreams:  # multiple IP or RTSP cameras
         self.rect = np.unique(s, axis=0).shape[0] == 1  # rect inference if all shapes equal
         if not self.rect:
             print('WARNING: Different stream shapes detected. For optimal performance supply similarly-shaped streams.')
+        self.shape = tuple(int(x) for x in s[0][:2]) if self.rect else (img_size, img_size)  # batch (h, w)
+        self.batch = np.zeros((2, n, 3, *self.shape), dtype=np.uint8)  # double buffer, reused every other batch
+        self.pool = ThreadPool(n)  # cv2 releases the GIL, streams are letterboxed concurrently
+        self.last = [0] * n  # frame seq per stream in the previous batch
+        self.capture_ts = self.ts.copy()  # capture timestamps of the frames in the current batch
+        self.is_stale = [False] * n
 
     def update(self, index, cap):
-        # Read next stream frame in a daemon thread
-        n = 0
+        # Read frames in a daemon thread, paced by the stream itself (cap.read() blocks until the next frame)
+        n, failed = 0, False
         while cap.isOpened():
             n += 1
-            # _, self.imgs[index] = cap.read()
-            cap.grab()
-            if n == 4:  # read every 4th frame
-                success, im = cap.retrieve()
-                self.imgs[index] = im if success else self.imgs[index] * 0
-                n = 0
-            time.sleep(1 / self.fps)  # wait time
+            if self.drop == 'every' and n % self.every:
+                if not cap.grab():  # dropped without decoding
+                    time.sleep(0.01)
+                continue
+            success, im = cap.read()
+            ts = time.monotonic()
+            if not success:  # blank frame, capture timestamp left at the last good frame so staleness() grows
+                if not failed:
+                    with self.cond:
+                        self.imgs[index] = self.imgs[index] * 0
+                    failed = True
+                time.sleep(0.01)
+                continue
+            failed = False
+            if self.drop == 'all':
+                self.queues[index].put((im, ts))  # blocks while the consumer is `buffer` frames behind
+            with self.cond:
+                self.imgs[index], self.ts[index] = im, ts
+                self.seq[index] += 1
+                self.cond.notify_all()
+
+    def staleness(self):
+        # Seconds since the newest frame of every stream was captured
+        return time.monotonic() - self.ts
 
     def __iter__(self):
         self.count = -1
@@ -317,23 +362,40 @@ class LoadStreams:  # multiple IP or RTSP cameras
 
     def __next__(self):
         self.count += 1
-        img0 = self.imgs.copy()
         if cv2.waitKey(1) == ord('q'):  # q to quit
             cv2.destroyAllWindows()
             raise StopIteration
 
-        # Letterbox
-        img = [letterbox(x, self.img_size, auto=self.rect, stride=self.stride)[0] for x in img0]
-
-        # Stack
-        img = np.stack(img, 0)
-
-        # Convert
-        img = img[:, :, :, ::-1].transpose(0, 3, 1, 2)  # BGR to RGB, to bsx3x416x416
-        img = np.ascontiguousarray(img)
+        if self.drop == 'all':  # next frame of every stream, in order
+            frames = []
+            for i, q in enumerate(self.queues):
+                try:  # a stream already known stale is not waited for again
+                    frames.append(q.get(timeout=0.001 if self.is_stale[i] else self.stale))
+                except Empty:
+                    frames.append((self.imgs[i] * 0, self.ts[i]))  # dead stream: blank frame, reported stale below
+            img0, ts = zip(*frames)
+            img0, self.capture_ts = list(img0), np.array(ts)
+        else:  # newest frames once any stream has a new one, frames are never written again so no copy
+            with self.cond:
+                self.cond.wait_for(lambda: self.seq != self.last, timeout=self.stale)
+                img0, self.capture_ts, self.last = list(self.imgs), self.ts.copy(), list(self.seq)
+
+        # Report streams that stopped delivering frames
+        for i, a in enumerate(self.staleness()):
+            if (a > self.stale) != self.is_stale[i]:
+                self.is_stale[i] = not self.is_stale[i]
+                print(f'WARNING: stream {self.sources[i]} is stale, last frame {a:.1f}s ago' if self.is_stale[i] else
+                      f'stream {self.sources[i]} recovered')
+
+        # Letterbox, BGR to RGB, to bsx3x416x416 directly into the batch
+        img = self.batch[self.count % 2]
+        self.pool.starmap(self._letterbox, zip(range(len(img0)), img0, repeat(img)))
 
         return self.sources, img, img0, None
 
+    def _letterbox(self, i, x, out):
+        out[i] = letterbox(x, self.shape, auto=False, stride=self.stride)[0][:, :, ::-1].transpose(2, 0, 1)
+
     def __len__(self):
         return 0  # 1E12 frames = 32 streams at 30 FPS for 30 years
 
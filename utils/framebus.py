@@ -0,0 +1,206 @@
+# Frame bus utils: frames shared with inference worker processes through multiprocessing.shared_memory
+
+import multiprocessing as mp
+import queue
+import time
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from utils.camera import Frame
+
+# Compact result of one frame from a worker. error: message when loading (seq 0) or this frame's inference failed.
+# A worker that loaded its detector sends a seq 0 Record with the class names as result (InferencePool.names)
+Record = namedtuple('Record', 'seq ts result cost stale skip_ratio error', defaults=(None,))
+
+
+class FrameBus:
+    # Fixed-size slots in one shared memory block, indexed as a ring by the frame sequence number.
+    # Layout: header int64 (slots, 4) [seq, h, w, c] | ts float64 (slots,) | data uint8 (slots, capacity).
+    # A single writer copies each frame in once; readers in any process get zero-copy views. A slot is rewritten
+    # `slots` frames later, so a reader checks valid(frame) after use (seqlock) to detect an overwritten frame
+    def __init__(self, capacity=1920 * 1080 * 3, slots=8, name=None):
+        self.capacity, self.slots = capacity, slots
+        hb, tb = slots * 4 * 8, slots * 8
+        size = hb + tb + slots * capacity
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.name = self.shm.name
+        buf = self.shm.buf
+        self.header = np.ndarray((slots, 4), dtype=np.int64, buffer=buf)
+        self.ts = np.ndarray((slots,), dtype=np.float64, buffer=buf, offset=hb)
+        self.data = np.ndarray((slots, capacity), dtype=np.uint8, buffer=buf, offset=hb + tb)
+        if self.owner:
+            self.header[:] = 0
+        self.seq = 0
+
+    def write(self, img, ts=None):
+        # Copy a (h, w, c) uint8 frame into the next slot and return its sequence number
+        assert img.dtype == np.uint8 and img.nbytes <= self.capacity, f'frame {img.shape} exceeds slot capacity'
+        self.seq += 1
+        i = self.seq % self.slots
+        h, w = img.shape[:2]
+        c = img.shape[2] if img.ndim == 3 else 1
+        self.header[i, 0] = 0  # invalid while writing
+        self.data[i, :img.nbytes].reshape(img.shape)[:] = img
+        self.ts[i] = time.monotonic() if ts is None else ts
+        self.header[i, 1:] = h, w, c
+        self.header[i, 0] = self.seq
+        return self.seq
+
+    def read(self, seq):
+        # Zero-copy Frame for sequence number seq, None if its slot was already rewritten
+        i = seq % self.slots
+        if self.header[i, 0] != seq:
+            return None
+        h, w, c = self.header[i, 1:].tolist()
+        img = self.data[i, :h * w * c].reshape((h, w, c) if c > 1 else (h, w))
+        f = Frame(img, float(self.ts[i]), seq)
+        return f if self.valid(f) else None
+
+    def valid(self, frame):
+        # True while the slot still holds this frame
+        return self.header[frame.seq % self.slots, 0] == frame.seq
+
+    def close(self):
+        self.header = self.ts = self.data = None  # release the views before the mapping
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _worker(factory, name, capacity, slots, tasks, results, ready, load_timeout):
+    # Inference process: build the detector, then run detect(render=False) on bus frames named by the task queue
+    try:
+        det = factory()
+        r = getattr(det, 'ready', None)  # testyolo.YOLOv5Lite loads in the background
+        t = time.time()
+        while r is not None and not r.value:
+            if time.time() - t > load_timeout:
+                raise TimeoutError(f'detector not ready after {load_timeout:g}s')
+            time.sleep(0.01)
+        bus = FrameBus(capacity, slots, name=name)
+    except Exception as e:
+        results.put(Record(0, None, None, 0.0, True, None, f'{type(e).__name__}: {e}'))
+        return
+    results.put(Record(0, None, list(getattr(det, 'classes', None) or []), 0.0, False, None))
+    with ready.get_lock():
+        ready.value += 1
+    while True:
+        seq = tasks.get()
+        if seq is None:
+            break
+        f = bus.read(seq)
+        if f is None:
+            results.put(Record(seq, None, None, 0.0, True, None))
+            continue
+        t0 = time.time()
+        try:
+            out = det.detect(f.image, render=False)[1:]  # the input image is not sent back
+        except Exception as e:
+            results.put(Record(seq, f.ts, None, time.time() - t0, not bus.valid(f), None, f'{type(e).__name__}: {e}'))
+            continue
+        cost = time.time() - t0
+        skip = det.gate.skip_ratio if getattr(det, 'gate', None) is not None else None  # motion gate in the worker
+        results.put(Record(seq, f.ts, out[0] if len(out) == 1 else out, cost, not bus.valid(f), skip))
+    bus.close()
+
+
+class InferencePool:
+    """Inference in worker processes fed through a FrameBus, so the GUI process keeps its GIL and cores.
+
+    factory: picklable callable building the detector in the worker, e.g. functools.partial(YOLOv5Lite, w, names)
+    Records hold detect(render=False) without the image: (classIds, confidences, boxes, cost) for YOLOv5Lite,
+    a SegResult for YOLOv11Seg. Drawing stays in the caller on its own frame. A worker whose detector fails to load
+    (exception, or not ready within load_timeout seconds) sends a seq 0 Record with error set and exits;
+    wait_ready() raises it. The detector's class names (parsed once, in the worker) are in self.names once a worker
+    has loaded; poll() never returns the records carrying them.
+
+    Usage:
+        pool = InferencePool(partial(YOLOv5Lite, 'driver/bestyolo.pt', 'driver/names1.txt'))
+        pool.wait_ready()
+        seq = pool.submit(frame)
+        for r in pool.poll(): ...
+        pool.close()
+    """
+
+    def __init__(self, factory, workers=1, slots=8, capacity=1920 * 1080 * 3, load_timeout=120.0):
+        ctx = mp.get_context('spawn')  # torch/Qt threads are not fork safe
+        self.bus = FrameBus(capacity, slots)
+        self.tasks, self.results = ctx.Queue(), ctx.Queue()
+        self.ready = ctx.Value('i', 0)  # number of workers with a loaded detector
+        self.names = None  # detector class names, set by the first worker that loads
+        self.backlog = []  # records drained by wait_ready(), returned by the next poll()
+        self.procs = [ctx.Process(target=_worker, daemon=True, args=(factory, self.bus.name, capacity, slots, self.tasks,
+                                                                     self.results, self.ready, load_timeout))
+                      for _ in range(workers)]
+        for p in self.procs:
+            p.start()
+
+    def wait_ready(self, timeout=None):
+        # Block until every worker has loaded its detector and self.names is set: True, False on timeout,
+        # RuntimeError if a worker failed
+        t = time.time()
+        while self.ready.value < len(self.procs) or self.names is None:
+            dead = [p.exitcode for p in self.procs if p.exitcode is not None]
+            self.backlog += self._drain()  # after the exit check, so the error a dead worker sent is drained too
+            err = next((r.error for r in self.backlog if r.seq == 0 and r.error), None)
+            if err is not None:
+                raise RuntimeError(f'Inference worker failed to load: {err}')
+            if dead:
+                raise RuntimeError(f'Inference worker exited with code {dead[0]}')
+            if timeout is not None and time.time() - t > timeout:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def submit(self, img, ts=None):
+        # Publish a frame and queue it for the next free worker, returns its sequence number
+        seq = self.bus.write(img, ts)
+        self.tasks.put(seq)
+        return seq
+
+    def poll(self):
+        # All records available now, non-blocking
+        out, self.backlog = self.backlog + self._drain(), []
+        return out
+
+    def _drain(self):
+        out = []
+        while True:
+            try:
+                r = self.results.get_nowait()
+            except queue.Empty:
+                return out
+            if self._keep(r):
+                out.append(r)
+
+    def _keep(self, r):
+        # Take the class names off a worker's load record, True for records meant for the caller
+        if r.seq == 0 and r.error is None:
+            self.names = self.names or r.result
+            return False
+        return True
+
+    def get(self, timeout=None):
+        # Next record, None on timeout
+        if self.backlog:
+            return self.backlog.pop(0)
+        t = time.time()
+        while True:
+            try:
+                r = self.results.get(timeout=None if timeout is None else max(timeout - (time.time() - t), 0))
+            except queue.Empty:
+                return None
+            if self._keep(r):
+                return r
+
+    def close(self):
+        for _ in self.procs:
+            self.tasks.put(None)
+        for p in self.procs:
+            p.join(timeout=2.0)
+            if p.is_alive():
+                p.terminate()
+        self.bus.close()
@@ -472,6 +472,10 @@ def non_max_suppression(prediction, conf_thres=0.25, iou_thres=0.45, classes=Non
 
     t = time.time()
     output = [torch.zeros((0, 6), device=prediction.device)] * prediction.shape[0]
+    if not merge and not labels:  # single NMS call over the whole batch, same output as the per-image loop below
+        return _batched_nms(prediction, xc, output, conf_thres, iou_thres, classes, agnostic, multi_label,
+                            max_wh, max_det, max_nms)
+
     for xi, x in enumerate(prediction):  # image index, image inference
         # Apply constraints
         # x[((x[..., 2:4] < min_wh) | (x[..., 2:4] > max_wh)).any(1), 4] = 0  # width-height
@@ -541,6 +545,106 @@ def non_max_suppression(prediction, conf_thres=0.25, iou_thres=0.45, classes=Non
     return output
 
 
+def _batched_nms(prediction, xc, output, conf_thres, iou_thres, classes, agnostic, multi_label, max_wh, max_det,
+                 max_nms, max_cpu=1000):
+    # Batched path of non_max_suppression(): candidates of all images are offset by image index (and class) and
+    # suppressed in one torchvision.ops.nms() call, then split back per image
+    bi, ai = xc.nonzero(as_tuple=True)  # image index, anchor index of candidates
+    x = prediction[bi, ai]  # confidence
+
+    # Compute conf
+    x[:, 5:] *= x[:, 4:5]  # conf = obj_conf * cls_conf
+
+    # Box (center x, center y, width, height) to (x1, y1, x2, y2)
+    box = xywh2xyxy(x[:, :4])
+
+    # Detections matrix nx6 (xyxy, conf, cls)
+    if multi_label:
+        i, j = (x[:, 5:] > conf_thres).nonzero(as_tuple=False).T
+        x, bi = torch.cat((box[i], x[i, j + 5, None], j[:, None].float()), 1), bi[i]
+    else:  # best class only
+        conf, j = x[:, 5:].max(1, keepdim=True)
+        k = conf.view(-1) > conf_thres
+        x, bi = torch.cat((box, conf, j.float()), 1)[k], bi[k]
+
+    # Filter by class
+    if classes is not None:
+        k = (x[:, 5:6] == torch.tensor(classes, device=x.device)).any(1)
+        x, bi = x[k], bi[k]
+
+    # Check shape
+    if not x.shape[0]:  # no boxes
+        return output
+    n = torch.bincount(bi, minlength=len(output))  # boxes per image
+    if (n > max_nms).any():  # excess boxes, keep the max_nms most confident of each image
+        k = x[:, 4].argsort(descending=True)
+        k = k[bi[k].sort(stable=True)[1]]  # grouped by image, confidence descending within each image
+        rank = torch.arange(len(k), device=x.device) - (n.cumsum(0) - n)[bi[k]]
+        k = k[rank < max_nms]
+        x, bi = x[k], bi[k]
+
+    # Batched NMS
+    c = x[:, 5:6] * (0 if agnostic else max_wh)  # classes
+    boxes, scores = x[:, :4] + c, x[:, 4]  # boxes (offset by class), scores
+    if x.device.type == 'cpu' and x.shape[0] > max_cpu:  # CPU nms cost grows with n^2, split it per image
+        for xi in bi.unique().tolist():
+            k = (bi == xi).nonzero(as_tuple=False).view(-1)
+            output[xi] = x[k[torchvision.ops.nms(boxes[k], scores[k], iou_thres)[:max_det]]]
+        return output
+
+    # images are offset by an integer step in float64, which keeps every float32 box value (and so the IoUs) exact
+    step = math.ceil(float(boxes.max() - boxes.min())) + 1
+    boxes = boxes.double() + bi[:, None].double() * step
+    i = torchvision.ops.nms(boxes, scores.double(), iou_thres)  # NMS, sorted by descending score
+    bi = bi[i]
+    for xi in bi.unique().tolist():
+        output[xi] = x[i[bi == xi][:max_det]]  # limit detections
+    return output
+
+
+def weighted_boxes_fusion(dets, weights=None, iou_thres=0.55, max_boxes=300, rescale=True):
+    """Fuses per-model detections of one image with Weighted Boxes Fusion https://arxiv.org/abs/1910.13302
+
+    Boxes of the same class are clustered around NMS-kept seed boxes: every box joins the highest scoring seed it
+    overlaps by more than iou_thres. The fused box is the score-weighted mean of its members and its score the mean
+    member score, scaled down when fewer models agree (rescale=True). Clustering uses one IoU matrix per class, no
+    per-box loop.
+
+    Args:
+        dets: list of (n, 6) tensors [xyxy, conf, cls], one per model (e.g. non_max_suppression output)
+        weights: per-model score weights, default 1 for every model
+        max_boxes: top-k boxes by weighted score kept per class before clustering
+        rescale: multiply scores by min(cluster size, models) / sum(weights), as in the paper. Disable when the
+            fused scores are thresholded again with the members' confidence threshold
+
+    Returns:
+         (n, 6) tensor [xyxy, conf, cls] sorted by descending conf
+    """
+    weights = torch.ones(len(dets)) if weights is None else torch.as_tensor(weights, dtype=torch.float32)
+    device = dets[0].device
+    x = torch.cat([torch.cat((d[:, :6], d.new_full((len(d), 1), k)), 1) for k, d in enumerate(dets)]).cpu().float()
+    if not len(x):
+        return torch.zeros((0, 6), device=device)
+    x[:, 4] *= weights[x[:, 6].long()]  # weighted scores
+    x = x[x[:, 4].argsort(descending=True)]
+
+    out = []
+    for c in x[:, 5].unique():
+        xc = x[x[:, 5] == c][:max_boxes]
+        seeds = torchvision.ops.nms(xc[:, :4], xc[:, 4], iou_thres)  # cluster seeds, descending score
+        j = (box_iou(xc[:, :4], xc[seeds, :4]) > iou_thres).byte().argmax(1)  # first (best) matching seed
+        s = xc[:, 4]
+        ssum = s.new_zeros(len(seeds)).index_add_(0, j, s)
+        n = s.new_zeros(len(seeds)).index_add_(0, j, torch.ones_like(s))
+        fused = xc.new_zeros((len(seeds), 4)).index_add_(0, j, xc[:, :4] * s[:, None]) / ssum.clamp(min=1e-9)[:, None]
+        conf = ssum / n
+        if rescale:
+            conf = conf * n.clamp(max=len(dets)) / weights.sum()
+        out.append(torch.cat((fused, conf[:, None], c.expand(len(seeds), 1)), 1))
+    out = torch.cat(out)
+    return out[out[:, 4].argsort(descending=True)].to(device)
+
+
 def strip_optimizer(f='best.pt', s=''):  # from utils.general import *; strip_optimizer()
     # Strip optimizer from 'f' to finalize training, optionally save as 's'
     x = torch.load(f, map_location=torch.device('cpu'))
@@ -0,0 +1,43 @@
+# Motion gate utils: skip inference on frames that did not change (stopped conveyor, empty belt)
+
+import cv2
+
+
+class MotionGate:
+    # Compares each frame with the last frame that was inferred on, as a small color thumbnail. A thumbnail pixel
+    # changed when its largest per-channel absolute difference (0-255 scale) exceeds threshold, so a red crayfish on a
+    # belt of similar brightness still counts; the frame changed when more than `area`
+    # of the thumbnail pixels changed. Counting pixels instead of averaging the difference keeps a small object
+    # entering or moving on a static belt from being diluted by the unchanged background. Unchanged frames let the
+    # caller reuse the previous result; after max_skip consecutive skips the next frame is always let through
+    def __init__(self, threshold=12, area=0.001, size=(64, 48), max_skip=100):
+        self.threshold = threshold
+        self.area = area  # fraction of thumbnail pixels, 0.001 of 64x48 = 3 pixels
+        self.size = size  # thumbnail (w, h)
+        self.max_skip = max_skip
+        self.reset()
+
+    def reset(self):
+        self.ref = None  # thumbnail of the last inferred frame
+        self.streak = 0  # consecutive skipped frames
+        self.frames = self.skipped = 0
+
+    def changed(self, img):
+        t = cv2.resize(img, self.size, interpolation=cv2.INTER_AREA)
+        self.frames += 1
+        if self.ref is None or t.shape != self.ref.shape or self.streak >= self.max_skip or self.diff(t) > self.area:
+            self.ref, self.streak = t, 0
+            return True
+        self.skipped += 1
+        self.streak += 1
+        return False
+
+    def diff(self, t):
+        # Fraction of thumbnail pixels that changed against the reference
+        d = cv2.absdiff(t, self.ref)
+        return ((d.max(2) if d.ndim == 3 else d) > self.threshold).mean()
+
+    @property
+    def skip_ratio(self):
+        # Fraction of frames whose inference was skipped since the last reset()
+        return self.skipped / max(self.frames, 1)
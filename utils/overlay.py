@@ -0,0 +1,78 @@
+# Overlay rendering utils: boxes, labels and masks for a whole frame in one pass
+
+import cv2
+import numpy as np
+
+palette = ((56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255), (49, 210, 207), (10, 249, 72),
+           (23, 204, 146), (134, 219, 61), (52, 147, 26), (187, 212, 0), (168, 153, 44), (255, 194, 0),
+           (147, 69, 52), (255, 115, 100), (236, 24, 0), (255, 56, 132), (133, 0, 82), (255, 56, 203))  # BGR
+
+
+class OverlayRenderer:
+    # Draws detections onto a BGR frame outside the timed inference path. Label text is rasterised once per
+    # (text, class) and cached as a sprite, masks of all instances are blended with a single weighted add
+    def __init__(self, names, colors=None, line_thickness=2, mask_alpha=0.5, max_sprites=512):
+        self.names = list(names)
+        self.colors = [tuple(int(c) for c in x) for x in colors] if colors is not None else \
+            [palette[i % len(palette)] for i in range(len(self.names))]
+        self.tl = line_thickness
+        self.tf = max(line_thickness - 1, 1)  # font thickness
+        self.alpha = mask_alpha
+        self.max_sprites = max_sprites
+        self.sprites = {}  # (text, cls) -> filled label image
+
+    def sprite(self, text, c):
+        # Return cached label sprite (h, w, 3) for text drawn on class c color
+        key = (text, c)
+        s = self.sprites.get(key)
+        if s is None:
+            if len(self.sprites) >= self.max_sprites:
+                self.sprites.clear()
+            (w, h), _ = cv2.getTextSize(text, 0, fontScale=self.tl / 3, thickness=self.tf)
+            s = np.empty((h + 3, w, 3), dtype=np.uint8)
+            s[:] = self.colors[c]
+            cv2.putText(s, text, (0, h + 1), 0, self.tl / 3, [225, 255, 255], thickness=self.tf, lineType=cv2.LINE_AA)
+            self.sprites[key] = s
+        return s
+
+    def draw(self, img, boxes, confs, cls, masks=None, polygons=None):
+        # Draw on img in place and return it
+        #   boxes (n,4) xyxy pixels, confs (n,), cls (n,) int
+        #   masks (n,H,W) bool at frame resolution, or polygons: list of n (k,2) pixel contours
+        cls = np.asarray(cls, dtype=np.int64).reshape(-1)
+        if masks is not None or polygons is not None:
+            self.blend_masks(img, cls, masks, polygons)
+
+        h, w = img.shape[:2]
+        for (x1, y1, x2, y2), conf, c in zip(np.asarray(boxes, dtype=np.int64).reshape(-1, 4), confs, cls):
+            cv2.rectangle(img, (int(x1), int(y1)), (int(x2), int(y2)), self.colors[c], self.tl, cv2.LINE_AA)
+            s = self.sprite(f'{self.names[c]} {conf:.2f}', int(c))
+            sh, sw = s.shape[:2]
+            top = y1 - sh if y1 - sh >= 0 else y1  # label above the box, inside it at the top edge
+            y0, x0 = max(int(top), 0), max(int(x1), 0)
+            ye, xe = min(y0 + sh, h), min(x0 + sw, w)
+            if ye > y0 and xe > x0:
+                img[y0:ye, x0:xe] = s[:ye - y0, :xe - x0]
+        return img
+
+    def blend_masks(self, img, cls, masks=None, polygons=None):
+        # Paint every instance into one label map (0 = background, i + 1 = instance i), then blend once
+        h, w = img.shape[:2]
+        if masks is not None:
+            masks = np.asarray(masks, dtype=bool)
+            if not len(masks):
+                return img
+            index = (masks * np.arange(1, len(masks) + 1, dtype=np.uint16)[:, None, None]).max(0)
+        else:
+            if not len(polygons):
+                return img
+            index = np.zeros((h, w), dtype=np.uint16)
+            for i, p in enumerate(polygons):
+                if len(p):
+                    cv2.fillPoly(index, [np.asarray(p, dtype=np.int32).reshape(-1, 1, 2)], i + 1)
+        fg = index > 0
+        if not fg.any():
+            return img
+        lut = np.array([(0, 0, 0)] + [self.colors[c] for c in cls], dtype=np.float32)  # instance -> color
+        img[fg] = (img[fg] * (1 - self.alpha) + lut[index[fg]] * self.alpha).astype(np.uint8)
+        return img
@@ -0,0 +1,50 @@
+# Region-of-interest utils: crop a frame to the conveyor belt before inference and map detections back
+
+import cv2
+import numpy as np
+import torch
+
+
+class Roi:
+    # Rectangle (x1, y1, x2, y2) or polygon [(x, y), ...] in frame pixels. Inference runs on the bounding rectangle
+    # only, detections whose box centre falls outside the polygon are dropped with a lookup in a precomputed mask
+    def __init__(self, region):
+        p = np.asarray(region, dtype=np.float64)
+        if p.ndim == 1:
+            assert len(p) == 4, f'ROI rectangle must be (x1, y1, x2, y2), got {region}'
+            self.rect = np.round(p).astype(int)
+            self.mask = None  # every centre inside the rectangle is inside the ROI
+        else:
+            assert p.ndim == 2 and p.shape[1] == 2 and len(p) >= 3, 'ROI polygon needs >= 3 (x, y) points'
+            self.rect = np.r_[np.floor(p.min(0)), np.ceil(p.max(0)) + 1].astype(int)
+            x1, y1, x2, y2 = self.rect
+            self.mask = np.zeros((y2 - y1, x2 - x1), dtype=np.uint8)
+            cv2.fillPoly(self.mask, [np.round(p - (x1, y1)).astype(np.int32).reshape(-1, 1, 2)], 1)
+            self.mask = self.mask.astype(bool)
+
+    def crop(self, img):
+        # Return the ROI bounding rectangle of img (a view, clipped to the frame) and its (x, y) offset
+        h, w = img.shape[:2]
+        x1, y1, x2, y2 = self.rect
+        x1, y1, x2, y2 = min(max(x1, 0), w - 1), min(max(y1, 0), h - 1), max(min(x2, w), 1), max(min(y2, h), 1)
+        return img[y1:y2, x1:x2], (x1, y1)
+
+    def contains(self, boxes):
+        # Boolean (n,) mask of xyxy frame-coordinate boxes whose centre lies inside the ROI
+        b = boxes.cpu().numpy() if isinstance(boxes, torch.Tensor) else np.asarray(boxes, dtype=np.float64)
+        b = b.reshape(-1, 4)
+        cx, cy = (b[:, 0] + b[:, 2]) / 2, (b[:, 1] + b[:, 3]) / 2
+        x1, y1, x2, y2 = self.rect
+        inside = (cx >= x1) & (cx < x2) & (cy >= y1) & (cy < y2)
+        if self.mask is not None:
+            ix = np.clip(cx - x1, 0, x2 - x1 - 1).astype(int)
+            iy = np.clip(cy - y1, 0, y2 - y1 - 1).astype(int)
+            inside &= self.mask[iy, ix]
+        return inside
+
+    def restore(self, det, offset):
+        # Map (n, >=4) xyxy detections from crop to frame coordinates in place and drop those outside the ROI
+        det[:, [0, 2]] += offset[0]
+        det[:, [1, 3]] += offset[1]
+        keep = self.contains(det[:, :4])
+        return det[torch.from_numpy(keep).to(det.device)] if isinstance(det, torch.Tensor) else det[keep]
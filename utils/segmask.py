@@ -0,0 +1,93 @@
+# Segmentation mask utils: instance masks and contours evaluated at prototype resolution inside each box
+
+import cv2
+import numpy as np
+import torch
+
+from utils.cutgeom import scale_mask_points
+
+
+def box_windows(boxes, input_shape, mask_shape):
+    # (n, 4) xyxy boxes in model input pixels -> (n, 4) int [x1, y1, x2, y2] windows in mask pixels, clipped
+    mh, mw = mask_shape
+    r = np.array([mw / input_shape[1], mh / input_shape[0]])  # input -> mask scale
+    b = np.asarray(boxes, dtype=np.float64).reshape(-1, 2, 2) * r
+    lt = np.clip(np.floor(b[:, 0]), 0, [mw, mh])
+    rb = np.clip(np.ceil(b[:, 1]), 0, [mw, mh])
+    return np.concatenate((lt, rb), 1).astype(int)
+
+
+def proto_masks(proto, coeffs, boxes, input_shape):
+    """Binary instance masks from YOLO-seg prototypes, evaluated only inside each box.
+
+    Unlike ultralytics ops.process_mask(upsample=False), which multiplies every instance's coefficients with the
+    full prototype grid before cropping, each instance costs one (c,) x (c, h*w) product over its own box window.
+
+    Args:
+        proto: (c, mh, mw) prototype tensor
+        coeffs: (n, c) mask coefficients
+        boxes: (n, 4) xyxy boxes in model input pixels (H, W)
+        input_shape: (H, W) letterboxed model input shape
+
+    Returns:
+        crops: list of n (h, w) uint8 {0, 1} masks, windows: (n, 4) int [x1, y1, x2, y2] in mask pixels
+    """
+    c, mh, mw = proto.shape
+    windows = box_windows(boxes.cpu().numpy() if torch.is_tensor(boxes) else boxes, input_shape, (mh, mw))
+    proto, coeffs = proto.float(), coeffs.float()
+    crops = []
+    for k, (x1, y1, x2, y2) in enumerate(windows):
+        logits = coeffs[k] @ proto[:, y1:y2, x1:x2].reshape(c, -1)
+        crops.append((logits > 0).reshape(y2 - y1, x2 - x1).to(torch.uint8).cpu().numpy())  # sigmoid > 0.5
+    return crops, windows
+
+
+def paste_masks(crops, windows, mask_shape):
+    # Box-window crops -> (n, mh, mw) full masks at prototype resolution (e.g. for utils.cutgeom.cut_geometry)
+    masks = np.zeros((len(crops), *mask_shape), dtype=np.uint8)
+    for m, c, (x1, y1, x2, y2) in zip(masks, crops, windows):
+        m[y1:y2, x1:x2] = c
+    return masks
+
+
+def crop_contours(crops, windows, mask_shape, input_shape, orig_shape):
+    """Trace the largest outer contour of every box-window mask crop.
+
+    Args:
+        crops: list of n (h, w) binary masks, crops[i] covering windows[i]
+        windows: (n, 4) [x1, y1, x2, y2] windows in mask pixels
+        mask_shape: (mh, mw) prototype mask shape
+        input_shape: (H, W) letterboxed model input shape
+        orig_shape: (h0, w0) frame shape
+
+    Returns:
+        list of n (k, 2) float32 polygons in frame pixels; work scales with box area, not frame area
+    """
+    r = np.array([mask_shape[1] / input_shape[1], mask_shape[0] / input_shape[0]])  # input -> mask scale
+    out = []
+    for m, (x1, y1, _, _) in zip(crops, windows):
+        roi = np.ascontiguousarray(m > 0.5, dtype=np.uint8)
+        cs = cv2.findContours(roi, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[-2] if roi.size else ()
+        if not len(cs):
+            out.append(np.zeros((0, 2), dtype=np.float32))
+            continue
+        c = max(cs, key=cv2.contourArea).reshape(-1, 2) + (x1 + 0.5, y1 + 0.5)  # pixel centres in mask space
+        out.append(scale_mask_points(c / r, input_shape, orig_shape).astype(np.float32))
+    return out
+
+
+def mask_contours(masks, boxes, input_shape, orig_shape):
+    """Trace one outer contour per instance on low-resolution masks, only inside the instance box.
+
+    Args:
+        masks: (n, mh, mw) binary masks at prototype resolution (e.g. ops.process_mask(..., upsample=False))
+        boxes: (n, 4) xyxy boxes in model input pixels (H, W)
+        input_shape: (H, W) letterboxed model input shape
+        orig_shape: (h0, w0) frame shape
+
+    Returns:
+        list of n (k, 2) float32 polygons in frame pixels; work scales with box area, not frame area
+    """
+    windows = box_windows(boxes, input_shape, masks.shape[1:])
+    crops = [m[y1:y2, x1:x2] for m, (x1, y1, x2, y2) in zip(masks, windows)]
+    return crop_contours(crops, windows, masks.shape[1:], input_shape, orig_shape)
@@ -1,6 +1,7 @@
 # YOLOv5 PyTorch utils
 
 import datetime
+import json
 import logging
 import math
 import os
@@ -86,6 +87,26 @@ def select_device(device='', batch_size=None):
     return torch.device('cuda:0' if cuda else 'cpu')
 
 
+def runtime_profile(file, weights):
+    # Return the autotune.py profile for this host and weights from a JSON profile file, or None
+    file = Path(file)
+    if not file.exists():
+        return None
+    with open(file, encoding='utf-8') as f:
+        return json.load(f).get(f'{platform.node()}/{Path(weights).name}')
+
+
+def apply_runtime_profile(cfg):
+    # Apply the process-wide CPU settings of a runtime profile (intra-op and inter-op thread counts)
+    torch.set_num_threads(cfg['threads'])
+    if torch.get_num_interop_threads() != cfg['interop']:
+        try:
+            torch.set_num_interop_threads(cfg['interop'])
+        except RuntimeError:  # can only be set once, before any inter-op parallel work has started
+            logger.warning(f"interop threads already fixed at {torch.get_num_interop_threads()}, "
+                           f"profile asks for {cfg['interop']}")
+
+
 def time_synchronized():
     # pytorch-accurate time
     if torch.cuda.is_available():
@@ -0,0 +1,189 @@
+# Multi-object tracking utils: ByteTrack-style IoU/Kalman association https://arxiv.org/abs/2110.06864
+# All tracks are held in arrays and filtered together, so per-frame cost does not grow with python-level loops
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+_std_pos, _std_vel = 1. / 20, 1. / 160  # process/measurement noise relative to box height
+_F = np.eye(8)
+_F[:4, 4:] = np.eye(4)  # constant velocity, unit time step = 1 frame
+_H = np.eye(4, 8)
+
+
+def xyxy2xyah(x):
+    # (n,4) [x1, y1, x2, y2] to [cx, cy, w/h, h]
+    w, h = x[:, 2] - x[:, 0], x[:, 3] - x[:, 1]
+    return np.stack(((x[:, 0] + x[:, 2]) / 2, (x[:, 1] + x[:, 3]) / 2, w / np.maximum(h, 1e-6), h), 1)
+
+
+def xyah2xyxy(x):
+    # (n,4) [cx, cy, w/h, h] to [x1, y1, x2, y2]
+    w = x[:, 2] * x[:, 3]
+    return np.stack((x[:, 0] - w / 2, x[:, 1] - x[:, 3] / 2, x[:, 0] + w / 2, x[:, 1] + x[:, 3] / 2), 1)
+
+
+def box_iou_np(a, b):
+    # (n,4), (m,4) xyxy -> (n,m) IoU
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), 2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], 1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], 1)
+    return inter / (area_a[:, None] + area_b[None] - inter + 1e-9)
+
+
+class KalmanFilterXYAH:
+    # Batched Kalman filter over (n,8) states [cx, cy, a, h, vx, vy, va, vh], one row per track
+    @staticmethod
+    def initiate(z):
+        h = z[:, 3]
+        std = np.stack((2 * _std_pos * h, 2 * _std_pos * h, np.full_like(h, 1e-2), 2 * _std_pos * h,
+                        10 * _std_vel * h, 10 * _std_vel * h, np.full_like(h, 1e-5), 10 * _std_vel * h), 1)
+        mean = np.concatenate((z, np.zeros_like(z)), 1)
+        cov = np.einsum('ni,ij->nij', std ** 2, np.eye(8))
+        return mean, cov
+
+    @staticmethod
+    def predict(mean, cov):
+        h = mean[:, 3]
+        std = np.stack((_std_pos * h, _std_pos * h, np.full_like(h, 1e-2), _std_pos * h,
+                        _std_vel * h, _std_vel * h, np.full_like(h, 1e-5), _std_vel * h), 1)
+        mean = mean @ _F.T
+        cov = _F @ cov @ _F.T + np.einsum('ni,ij->nij', std ** 2, np.eye(8))
+        return mean, cov
+
+    @staticmethod
+    def update(mean, cov, z):
+        h = mean[:, 3]
+        std = np.stack((_std_pos * h, _std_pos * h, np.full_like(h, 1e-1), _std_pos * h), 1)
+        S = _H @ cov @ _H.T + np.einsum('ni,ij->nij', std ** 2, np.eye(4))  # (n,4,4) innovation covariance
+        K = np.linalg.solve(S, (cov @ _H.T).transpose(0, 2, 1)).transpose(0, 2, 1)  # (n,8,4) Kalman gain
+        mean = mean + np.einsum('nij,nj->ni', K, z - mean[:, :4])
+        cov = cov - K @ S @ K.transpose(0, 2, 1)
+        return mean, cov
+
+
+class ByteTracker:
+    """Associates per-frame detections into tracks with stable ids.
+
+    High-score detections are matched to all tracks by IoU first, then remaining low-score detections rescue tracks
+    that are still unmatched (occlusion, motion blur). Tracks unmatched for more than max_lost frames are dropped.
+    Call update(det) on frames with detections and update(None) on frames without (detector skipped), which only
+    advances the Kalman prediction, so the detector can run every Nth frame. Detector conf threshold should be at or
+    below low_thresh for the second association stage to see the low-score boxes.
+
+    Returns (n, 7) arrays [x1, y1, x2, y2, conf, cls, track_id] of the currently tracked objects.
+    """
+
+    def __init__(self, high_thresh=0.5, low_thresh=0.1, new_thresh=0.6, match_iou=0.2, low_match_iou=0.5,
+                 max_lost=30):
+        self.high_thresh, self.low_thresh, self.new_thresh = high_thresh, low_thresh, new_thresh
+        self.match_iou, self.low_match_iou = match_iou, low_match_iou
+        self.max_lost = max_lost
+        self.kf = KalmanFilterXYAH()
+        self.next_id = 1
+        self.mean, self.cov = np.zeros((0, 8)), np.zeros((0, 8, 8))
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.cls = np.zeros(0, dtype=np.int64)
+        self.conf = np.zeros(0)
+        self.lost = np.zeros(0, dtype=np.int64)  # frames since last matched detection
+        self.tracked = np.zeros(0, dtype=bool)  # matched on the last frame with detections
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def boxes(self):
+        return xyah2xyxy(self.mean[:, :4])
+
+    @property
+    def velocity(self):
+        # (n,2) predicted box centre velocity in pixels per frame
+        return self.mean[:, 4:6].copy()
+
+    def _match(self, tracks, det, iou_thres):
+        # Hungarian matching on IoU of same-class pairs -> (k,) track indices, (k,) detection indices
+        if not len(tracks) or not len(det):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        iou = box_iou_np(self.boxes[tracks], det[:, :4])
+        iou[self.cls[tracks][:, None] != det[None, :, 5].astype(np.int64)] = 0
+        ti, di = linear_sum_assignment(-iou)
+        ok = iou[ti, di] > iou_thres
+        return tracks[ti[ok]], di[ok]
+
+    def update(self, det=None):
+        # det: (m, >=6) [x1, y1, x2, y2, conf, cls] frame detections, or None on frames where the detector did not run
+        if len(self):
+            self.mean, self.cov = self.kf.predict(self.mean, self.cov)
+            self.lost += 1
+        if det is not None:
+            det = np.asarray(det, dtype=np.float64)
+            det = det.reshape(-1, det.shape[-1]) if det.size else np.zeros((0, 6))
+            high, low = det[det[:, 4] >= self.high_thresh], det[(det[:, 4] >= self.low_thresh) &
+                                                                 (det[:, 4] < self.high_thresh)]
+
+            # 1st association: all tracks with high-score detections
+            ti, di = self._match(np.arange(len(self)), high, self.match_iou)
+            self._update_tracks(ti, high[di])
+            new = np.ones(len(high), dtype=bool)
+            new[di] = False
+
+            # 2nd association: tracks seen on the previous frame but unmatched above, with low-score detections
+            rest = np.setdiff1d(np.nonzero(self.tracked)[0], ti)
+            ti, di = self._match(rest, low, self.low_match_iou)
+            self._update_tracks(ti, low[di])
+
+            # start tracks from confident unmatched detections, drop tracks lost for too long
+            self._add_tracks(high[new & (high[:, 4] >= self.new_thresh)])
+            self._remove(self.lost > self.max_lost)
+            self.tracked = self.lost == 0
+        return self.tracks()
+
+    def tracks(self):
+        # Tracks matched on the last frame with detections, boxes at their current predicted position
+        i = self.tracked
+        return np.concatenate((self.boxes[i], self.conf[i, None], self.cls[i, None], self.ids[i, None]), 1)
+
+    def _update_tracks(self, i, det):
+        if len(i):
+            self.mean[i], self.cov[i] = self.kf.update(self.mean[i], self.cov[i], xyxy2xyah(det[:, :4]))
+            self.conf[i], self.cls[i], self.lost[i] = det[:, 4], det[:, 5], 0
+
+    def _add_tracks(self, det):
+        if len(det):
+            mean, cov = self.kf.initiate(xyxy2xyah(det[:, :4]))
+            n = len(det)
+            self.mean, self.cov = np.concatenate((self.mean, mean)), np.concatenate((self.cov, cov))
+            self.ids = np.concatenate((self.ids, np.arange(self.next_id, self.next_id + n)))
+            self.cls = np.concatenate((self.cls, det[:, 5].astype(np.int64)))
+            self.conf = np.concatenate((self.conf, det[:, 4]))
+            self.lost = np.concatenate((self.lost, np.zeros(n, dtype=np.int64)))
+            self.tracked = np.concatenate((self.tracked, np.ones(n, dtype=bool)))
+            self.next_id += n
+
+    def _remove(self, drop):
+        if drop.any():
+            keep = ~drop
+            self.mean, self.cov, self.ids = self.mean[keep], self.cov[keep], self.ids[keep]
+            self.cls, self.conf, self.lost = self.cls[keep], self.conf[keep], self.lost[keep]
+            self.tracked = self.tracked[keep]
+
+
+class TrackedDetector:
+    # Runs detector (YOLOv5Lite) every `every` frames and ByteTracker on all of them; in-between frames only cost a
+    # Kalman prediction. detect(frame) -> (n, 7) [x1, y1, x2, y2, conf, cls, track_id]
+    def __init__(self, detector, every=3, tracker=None):
+        self.detector = detector
+        self.every = every
+        self.tracker = tracker or ByteTracker()
+        self.frame = 0
+
+    def detect(self, frame):
+        det = None
+        if self.frame % self.every == 0:
+            _, cls, conf, boxes, _ = self.detector.detect(frame, render=False)
+            det = np.concatenate((np.asarray(boxes, dtype=np.float64).reshape(-1, 4),
+                                  np.asarray(conf, dtype=np.float64).reshape(-1, 1),
+                                  np.asarray(cls, dtype=np.float64).reshape(-1, 1)), 1)
+        self.frame += 1
+        return self.tracker.update(det)